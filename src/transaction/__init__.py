@@ -17,14 +17,49 @@
 
 # isort: off
 
+import os
+
 #: Default implementation of `~ITransaction`
 from transaction._transaction import Transaction  # noqa: F401 unused import
 #: Default implementation of `~ISavepoint`
 from transaction._transaction import Savepoint  # noqa: F401 unused import
+#: Lets worker threads work in a transaction, see `~ITransaction.forkContext`
+from transaction._transaction import ForkContext  # noqa: F401
+#: Outcomes of data managers, see `~ITransaction.outcomes`
+from transaction._transaction import Outcome  # noqa: F401 unused import
 #: A single-threaded `~ITransactionManager`
 from transaction._manager import TransactionManager  # noqa: F401 unused import
 #: A thread-safe `~ITransactionManager`
 from transaction._manager import ThreadTransactionManager
+#: A durable log of commit decisions, for recovery
+from transaction._recovery import CoordinatorLog  # noqa: F401 unused import
+#: Reports transactions that stay open too long
+from transaction._watchdog import Watchdog  # noqa: F401 unused import
+#: Commits the transactions of several managers together
+from transaction._coordinator import Coordinator  # noqa: F401 unused import
+#: Recommends batch sizes for `~ITransactionManager.chunked`
+from transaction._batching import BatchSizer  # noqa: F401 unused import
+#: A transactional in-memory mapping
+from transaction._memory import MemoryDataManager  # noqa: F401 unused import
+#: A memory-mapped journal file storing a transactional mapping
+from transaction._journal import Journal  # noqa: F401 unused import
+#: A transactional mapping stored in a `Journal`
+from transaction._journal import JournalDataManager  # noqa: F401
+#: Delivers the messages of committed transactions
+from transaction._outbox import Outbox  # noqa: F401 unused import
+#: Sends messages through an `Outbox` when transactions commit
+from transaction._outbox import OutboxDataManager  # noqa: F401
+#: An `~IOutboxStore` kept in a SQLite database
+from transaction._outbox import SQLiteOutboxStore  # noqa: F401
+#: The type of `~ITransaction.cache`
+from transaction._cache import TransactionCache  # noqa: F401 unused import
+#: Memoizes a function's results in `~ITransaction.cache`
+from transaction._cache import cached  # noqa: F401 unused import
+#: Exception types declared retryable or not
+from transaction._retry import RetryRegistry  # noqa: F401 unused import
+#: Registers functions to call in child processes after forking
+from transaction._manager import addAfterForkHook  # noqa: F401
+from transaction._manager import _afterFork
 
 # NB: "with transaction:" does not work because they worked
 # really hard to break looking up special methods like __enter__ and __exit__
@@ -51,3 +86,7 @@ isDoomed = manager.isDoomed
 savepoint = manager.savepoint
 #: See `.ITransactionManager.attempts`
 attempts = manager.attempts
+
+if hasattr(os, 'register_at_fork'):  # pragma: no branch
+    # Child processes must not use the transaction of their parent.
+    os.register_at_fork(after_in_child=lambda: _afterFork(manager))
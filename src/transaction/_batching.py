@@ -0,0 +1,86 @@
+############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+"""Choosing how much work to commit at a time.
+"""
+
+
+class BatchSizer:
+    """Recommend batch sizes by additive increase, multiplicative decrease.
+
+    Loops committing batches of work ask for the recommended `size`
+    before each batch and report the outcome: `committed` with the
+    duration of the commit, or `conflicted` when the batch failed with
+    a `retriable error <transaction.interfaces.ITransaction.isRetryableError>`
+    (typically a `~transaction.interfaces.TransientError`).
+
+    After each commit, the size grows by *increase* (by default, a
+    tenth of the initial size), up to *maximum*.  After each conflict,
+    and after each commit that took longer than *latency* seconds (if
+    given), it is multiplied by *decrease*, down to *minimum*.  This
+    probes for the largest batches that commit without conflicts, and
+    backs off quickly when batches get too large.
+
+    `~transaction.interfaces.ITransactionManager.chunked` accepts an
+    instance as its *size*.  Instances are not thread-safe: use one per
+    loop.
+    """
+
+    #: The number of commits reported.
+    commits = 0
+    #: The number of conflicts reported.
+    conflicts = 0
+    #: Moving average of the commit durations, in seconds (or None).
+    commit_time = None
+    #: Moving average of the fraction of attempts that conflicted.
+    conflict_rate = 0.0
+
+    def __init__(self, size=100, minimum=1, maximum=10000, increase=None,
+                 decrease=0.5, latency=None, smoothing=0.1):
+        if not 0 < minimum <= size <= maximum:
+            raise ValueError("need 0 < minimum <= size <= maximum")
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be between 0 and 1")
+        #: The recommended batch size.
+        self.size = size
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = max(1, size // 10) if increase is None else increase
+        self.decrease = decrease
+        self.latency = latency
+        self.smoothing = smoothing
+
+    def committed(self, seconds):
+        """Report that a batch committed, taking *seconds* to commit."""
+        self.commits += 1
+        self.conflict_rate = self._average(self.conflict_rate, 0.0)
+        if self.commit_time is None:
+            self.commit_time = seconds
+        else:
+            self.commit_time = self._average(self.commit_time, seconds)
+        if self.latency is not None and seconds > self.latency:
+            self._shrink()
+        else:
+            self.size = min(self.maximum, self.size + self.increase)
+
+    def conflicted(self):
+        """Report that a batch failed with a retriable error."""
+        self.conflicts += 1
+        self.conflict_rate = self._average(self.conflict_rate, 1.0)
+        self._shrink()
+
+    def _shrink(self):
+        self.size = max(self.minimum, int(self.size * self.decrease))
+
+    def _average(self, average, value):
+        return average + self.smoothing * (value - average)
@@ -0,0 +1,109 @@
+############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+"""Memoizing values for the lifetime of a transaction.
+"""
+import functools
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+
+_missing = object()
+
+
+class TransactionCache(MutableMapping):
+    """A mapping of values computed during a transaction.
+
+    This is the type of `~transaction.interfaces.ITransaction.cache`.
+    It is emptied when a savepoint of the transaction is rolled back,
+    and dropped when the transaction ends, so values computed from
+    transactional state never outlive it, nor survive a retry.
+
+    If *maxsize* is not None, the least recently used entries are
+    evicted to keep at most *maxsize* of them.  Like the transaction,
+    the cache isn't meant to be shared between threads.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        if self.maxsize is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        data = self._data
+        data[key] = value
+        if self.maxsize is not None:
+            data.move_to_end(key)
+            while len(data) > self.maxsize:
+                data.popitem(last=False)
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def clear(self):
+        self._data.clear()
+
+    def compute(self, key, func, *args, **kw):
+        """Return the value cached for *key*.
+
+        If there is none, cache and return ``func(*args, **kw)``.
+        """
+        value = self.get(key, _missing)
+        if value is _missing:
+            value = self[key] = func(*args, **kw)
+        return value
+
+
+def cached(func=None, transaction_manager=None):
+    """Memoize the results of *func* in the current transaction.
+
+    The results are kept in the `~transaction.interfaces.ITransaction.cache`
+    of the current transaction of *transaction_manager* (by default, the
+    thread-local ``transaction.manager``), keyed by the function and its
+    arguments, which must be hashable::
+
+        @transaction.cached
+        def allowed(user, permission):
+            ...
+
+    Use ``@transaction.cached(transaction_manager=tm)`` for another
+    manager.
+    """
+    if func is None:
+        return functools.partial(
+            cached, transaction_manager=transaction_manager)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kw):
+        manager = transaction_manager
+        if manager is None:
+            import transaction
+            manager = transaction.manager
+        key = (func, args, frozenset(kw.items())) if kw else (func, args)
+        return manager.get().cache.compute(key, func, *args, **kw)
+
+    return wrapper
@@ -0,0 +1,136 @@
+############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+"""Committing the transactions of several transaction managers together.
+"""
+import sys
+
+from transaction._transaction import Status
+from transaction._transaction import _commitResources
+
+
+class Coordinator:
+    """Commit the current transactions of several managers atomically.
+
+    Each registered `~transaction.interfaces.ITransactionManager` keeps
+    its own transaction, synchronizers and hooks.  `commit` runs a
+    single two-phase commit over the data managers joined to all of
+    them, in one `~transaction.interfaces.IDataManager.sortKey` order,
+    so either all of them commit or none does.
+
+    The transactions keep their own
+    `~transaction.interfaces.ITransaction.id`; the one of the first
+    transaction identifies the whole commit, e.g. in a
+    `~transaction.CoordinatorLog` (the first one configured on the
+    managers is used).
+    """
+
+    def __init__(self, managers=()):
+        self._managers = []
+        for manager in managers:
+            self.register(manager)
+
+    def register(self, manager):
+        """Add *manager* to the managers committed together."""
+        if manager not in self._managers:
+            self._managers.append(manager)
+
+    def unregister(self, manager):
+        """Remove *manager* from the managers committed together."""
+        self._managers.remove(manager)
+
+    @property
+    def managers(self):
+        """The registered managers, in registration order."""
+        return tuple(self._managers)
+
+    def get(self):
+        """Return the current transactions of all managers."""
+        return [manager.get() for manager in self._managers]
+
+    def begin(self):
+        """Begin a new transaction in all managers and return them."""
+        return [manager.begin() for manager in self._managers]
+
+    def __enter__(self):
+        return self.begin()
+
+    def __exit__(self, t, v, tb):
+        if v is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def doom(self):
+        """Doom the current transactions of all managers."""
+        for txn in self.get():
+            txn.doom()
+
+    def abort(self):
+        """Abort the current transactions of all managers.
+
+        All of them are aborted even if some fail; the first error is
+        raised afterwards.
+        """
+        error = None
+        for txn in self.get():
+            try:
+                txn.abort()
+            except:  # noqa: E722 do not use bare 'except'
+                if error is None:
+                    error = sys.exc_info()
+        if error is not None:
+            try:
+                raise error[1].with_traceback(error[2])
+            finally:
+                del error
+
+    def commit(self):
+        """Commit the current transactions of all managers together."""
+        transactions = self.get()
+        if not transactions:
+            return
+        for txn in transactions:
+            txn._checkCommittable()
+        for txn in transactions:
+            txn._callBeforeCommitHooks()
+        for txn in transactions:
+            txn._synchronizers.map(lambda s, txn=txn: s.beforeCompletion(txn))
+            txn.status = Status.COMMITTING
+
+        try:
+            _commitResources(transactions)
+            for txn in transactions:
+                txn.status = Status.COMMITTED
+        except:  # noqa: E722 do not use bare 'except'
+            t = None
+            v = None
+            tb = None
+            try:
+                t, v, tb = sys.exc_info()
+                for txn in transactions:
+                    txn._saveAndGetCommitishError()
+                for txn in transactions:
+                    txn._callAfterCommitHooks(status=False)
+                raise v.with_traceback(tb)
+            finally:
+                del t, v, tb
+        else:
+            for txn in transactions:
+                txn._synchronizers.map(
+                    lambda s, txn=txn: s.afterCompletion(txn))
+            for txn in transactions:
+                txn._callAfterCommitHooks(status=True)
+                txn._free()
+        for txn in transactions:
+            txn._debug("commit")
@@ -0,0 +1,336 @@
+############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+"""A transactional key-value store kept in a memory-mapped journal file.
+"""
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from zope.interface import implementer
+
+from transaction import interfaces
+from transaction._memory import MemoryDataManager
+from transaction._memory import _deleted
+from transaction._recovery import _GroupSync
+from transaction._recovery import _sync_directory
+
+
+# Each record is a header (record type, payload length, CRC-32 of the
+# payload) followed by the payload.  The file is preallocated with
+# zeros, so the journal ends at the first invalid header or payload.
+_HEADER = struct.Struct('>BII')
+_PREPARE = 1
+_COMMIT = 2
+_ABORT = 3
+
+# A prepare record's payload is the transaction id, prefixed by its
+# length, followed by the changes: key and value lengths, key and
+# value.  A deletion has no value and a length of _DELETE.
+_TID = struct.Struct('>H')
+_ENTRY = struct.Struct('>HI')
+_DELETE = 0xFFFFFFFF
+
+_MIN_CAPACITY = 1 << 20
+
+
+class Journal(_GroupSync):
+    """An append-only, memory-mapped file of committed changes.
+
+    The journal stores a mapping from text keys to bytes values.  It is
+    changed through `JournalDataManager` instances (usually, one per
+    transaction manager); all of them see the data committed by any of
+    them, but there is no isolation between them: the last to commit
+    a key wins.
+
+    When a data manager votes, its changes are written and synced to
+    disk, with a single sync for the votes of concurrent commits.  When
+    it finishes, a small commit marker is written, without syncing.
+    After a crash, a transaction that voted but has no marker is in
+    doubt, see `inDoubt`; `JournalDataManager.recover` finishes it,
+    which is what a `~transaction.CoordinatorLog` does.  (Without one,
+    a commit finished shortly before the operating system crashed may
+    be in doubt too.)
+
+    Committed values are read without copying, as read-only
+    `memoryview` objects of the mapped file.  The file only grows;
+    call `compact` to rewrite it with just the current data.
+
+    Journals are only supported on POSIX systems, which can resize and
+    replace files while they are mapped; creating one elsewhere (e.g.
+    on Windows) raises `NotImplementedError`.
+    """
+
+    def __init__(self, path):
+        if os.name != 'posix':
+            raise NotImplementedError("Journal requires a POSIX system")
+        self.path = path
+        # Serializes writes, and updates of the index.
+        self._lock = threading.Lock()
+        self._init_sync()
+        # key -> memoryview of the committed value.
+        self._index = {}
+        # id of a transaction that voted -> list of its changes, as
+        # (key, offset, length) triples; length is None for deletions.
+        self._pending = {}
+        self._fd = self._map = None
+        self._open()
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        capacity = max(os.fstat(fd).st_size, _MIN_CAPACITY)
+        os.ftruncate(fd, capacity)
+        self._fd = fd
+        self._remap(capacity)
+        self._end = self._scan()
+        # Zero whatever follows the end, so that nothing written there
+        # before a crash can be mistaken for a record later.
+        os.ftruncate(fd, self._end)
+        os.ftruncate(fd, capacity)
+
+    def _remap(self, capacity):
+        # Views of the previous map keep it alive as long as needed.
+        self._map = mmap.mmap(self._fd, capacity, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+    def close(self):
+        """Close the journal file."""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+                self._view = self._map = None
+
+    def __len__(self):
+        return len(self._index)
+
+    def inDoubt(self):
+        """Return the ids of the transactions that voted but didn't finish.
+        """
+        with self._lock:
+            return list(self._pending)
+
+    def prepare(self, tid, changes):
+        """Durably write *changes* made by transaction *tid*.
+
+        *changes* maps keys to values (bytes-like objects), or to None
+        for deleted keys.  They are committed by `finish`.
+        """
+        payload = _prepared(tid, changes.items())
+        with self._lock:
+            start, position = self._append(_PREPARE, payload)
+            self._pending.setdefault(tid, []).append(
+                _parse_prepared(payload, start + _HEADER.size)[1])
+        self._sync(position)
+
+    def finish(self, tid):
+        """Commit the changes prepared by transaction *tid*.
+
+        Finishing a transaction that isn't prepared does nothing.
+        """
+        with self._lock:
+            prepared = self._pending.pop(tid, None)
+            if prepared is None:
+                return
+            self._append(_COMMIT, tid.encode('utf-8'))
+            for entries in prepared:
+                self._apply(entries)
+
+    def abort(self, tid):
+        """Forget the changes prepared by transaction *tid*."""
+        with self._lock:
+            if self._pending.pop(tid, None) is not None:
+                self._append(_ABORT, tid.encode('utf-8'))
+
+    def compact(self):
+        """Rewrite the journal with only the current data.
+
+        Changes prepared by transactions that didn't finish yet are
+        kept.
+        """
+        with self._lock, self._synced_cond:
+            while self._syncing:
+                self._synced_cond.wait()
+            tmp = self.path + '.tmp'
+            with open(tmp, 'wb') as f:
+                # The current data is a single committed transaction.
+                changes = [(key, bytes(value))
+                           for key, value in self._index.items()]
+                f.write(_record(_PREPARE, _prepared('', changes)))
+                f.write(_record(_COMMIT, b''))
+                for tid, prepared in self._pending.items():
+                    for entries in prepared:
+                        changes = [(key, None if length is None else
+                                    self._view[offset:offset + length])
+                                   for key, offset, length in entries]
+                        f.write(_record(_PREPARE, _prepared(tid, changes)))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            _sync_directory(self.path)
+            os.close(self._fd)
+            self._index.clear()
+            self._pending.clear()
+            self._open()
+            # Everything that's left was just synced.
+            self._synced = self._written
+
+    def _append(self, kind, payload):
+        # Write a record, returning its offset and the position to sync.
+        data = _record(kind, payload)
+        end = self._end + len(data)
+        capacity = len(self._map)
+        if end > capacity:
+            while end > capacity:
+                capacity *= 2
+            os.ftruncate(self._fd, capacity)
+            self._remap(capacity)
+        start = self._end
+        view = memoryview(data)
+        offset = start
+        while view:
+            written = os.pwrite(self._fd, view, offset)
+            view = view[written:]
+            offset += written
+        self._end = end
+        self._written += len(data)
+        return start, self._written
+
+    def _apply(self, entries):
+        index = self._index
+        view = self._view
+        for key, offset, length in entries:
+            if length is None:
+                index.pop(key, None)
+            else:
+                index[key] = view[offset:offset + length]
+
+    def _scan(self):
+        # Load the journal, returning the offset of its end.
+        view = self._view
+        size = len(view)
+        pos = 0
+        while pos + _HEADER.size <= size:
+            kind, length, crc = _HEADER.unpack_from(view, pos)
+            start = pos + _HEADER.size
+            end = start + length
+            if kind not in (_PREPARE, _COMMIT, _ABORT) or end > size:
+                break
+            payload = view[start:end]
+            if zlib.crc32(payload) != crc:
+                break
+            if kind == _PREPARE:
+                tid, entries = _parse_prepared(payload, start)
+                self._pending.setdefault(tid, []).append(entries)
+            else:
+                prepared = self._pending.pop(bytes(payload).decode('utf-8'),
+                                             ())
+                if kind == _COMMIT:
+                    for entries in prepared:
+                        self._apply(entries)
+            pos = end
+        return pos
+
+
+def _record(kind, payload):
+    return _HEADER.pack(kind, len(payload), zlib.crc32(payload)) + payload
+
+
+def _prepared(tid, changes):
+    # Encode the payload of a prepare record.
+    tid = tid.encode('utf-8')
+    parts = [_TID.pack(len(tid)), tid]
+    for key, value in changes:
+        key = key.encode('utf-8')
+        if value is None:
+            parts.append(_ENTRY.pack(len(key), _DELETE))
+            parts.append(key)
+        else:
+            parts.append(_ENTRY.pack(len(key), len(value)))
+            parts.append(key)
+            parts.append(value)
+    return b''.join(parts)
+
+
+def _parse_prepared(payload, offset):
+    # Decode the payload of a prepare record found at *offset*.
+    length, = _TID.unpack_from(payload, 0)
+    pos = _TID.size + length
+    tid = bytes(payload[_TID.size:pos]).decode('utf-8')
+    entries = []
+    while pos < len(payload):
+        key_length, length = _ENTRY.unpack_from(payload, pos)
+        pos += _ENTRY.size
+        key = bytes(payload[pos:pos + key_length]).decode('utf-8')
+        pos += key_length
+        if length == _DELETE:
+            entries.append((key, offset + pos, None))
+        else:
+            entries.append((key, offset + pos, length))
+            pos += length
+    return tid, entries
+
+
+@implementer(interfaces.IRecoverableDataManager)
+class JournalDataManager(MemoryDataManager):
+    """A transactional mapping stored in a `Journal`.
+
+    Keys are text and values bytes-like objects.  Committed values are
+    read as read-only `memoryview` objects.  Like `MemoryDataManager`,
+    it supports savepoints.
+    """
+
+    def __init__(self, journal, transaction_manager=None, name=None):
+        super().__init__((), transaction_manager, name)
+        self.journal = journal
+        self._committed = journal._index
+        self._lock = journal._lock
+
+    def __setitem__(self, key, value):
+        if not isinstance(key, str):
+            raise TypeError("keys must be text")
+        super().__setitem__(key, bytes(value))
+
+    def _reset(self):
+        super()._reset()
+        self._tid = None
+
+    def tpc_vote(self, transaction):
+        super().tpc_vote(transaction)
+        if self._changes:
+            self._tid = transaction.id
+            self.journal.prepare(
+                self._tid,
+                {key: None if value is _deleted else value
+                 for key, value in self._changes.items()})
+
+    def tpc_finish(self, transaction):
+        if self._tid is not None:
+            self.journal.finish(self._tid)
+        self._reset()
+
+    def tpc_abort(self, transaction):
+        if self._tid is not None:
+            self.journal.abort(self._tid)
+        self._reset()
+
+    def sortKey(self):
+        if self.name is not None:
+            return self.name
+        return 'JournalDataManager:' + self.journal.path
+
+    def recover(self, transaction_id):
+        """See `~transaction.interfaces.IRecoverableDataManager`."""
+        self.journal.finish(transaction_id)
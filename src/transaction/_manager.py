@@ -16,20 +16,28 @@
 It coordinates application code and resource managers, so that they
 are associated with the right transaction.
 """
+import functools
 import itertools
+import logging
 import sys
 import threading
+import time
 
 from zope.interface import implementer
 
+from transaction._batching import BatchSizer
+from transaction._retry import RetryRegistry
 from transaction._transaction import Transaction
 from transaction.interfaces import AlreadyInTransaction
 from transaction.interfaces import ITransactionManager
 from transaction.interfaces import NoTransaction
-from transaction.interfaces import TransientError
+from transaction.interfaces import TransientError  # noqa: F401 BBB
 from transaction.weakset import WeakSet
 
 
+logger = logging.getLogger(__name__)
+
+
 # We have to remember sets of synch objects, especially Connections.
 # But we don't want mere registration with a transaction manager to
 # keep a synch object alive forever; in particular, it's common
@@ -57,16 +65,100 @@ def _new_transaction(txn, synchs):
 # Transaction object is constructed.
 
 
+def _hook_name(hook):
+    # The qualified name of a hook, used to aggregate its timings.
+    # Bound methods are new objects each time, and keeping hooks alive
+    # would leak, so we can't key the statistics by the hook itself.
+    while isinstance(hook, functools.partial):
+        hook = hook.func
+    name = getattr(hook, '__qualname__', None)
+    if name is None:
+        # A callable object.
+        hook = type(hook)
+        name = hook.__qualname__
+    module = getattr(hook, '__module__', None)
+    if module:
+        name = module + '.' + name
+    return name
+
+
+class _HookStats:
+    # Hook timings of the transactions of a manager.  The managers of
+    # all threads of a ThreadTransactionManager record into one.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # qualified hook name -> [number of calls, total seconds]
+        self._stats = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = [0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+
+    def get(self):
+        with self._lock:
+            return {name: tuple(stats)
+                    for name, stats in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _resetAfterFork(self):
+        # Another thread may have held the lock when the process forked.
+        self._lock = threading.Lock()
+
+
 @implementer(ITransactionManager)
 class TransactionManager:
     """Single-thread implementation of
     `~transaction.interfaces.ITransactionManager`.
+
+    Application code should use a transaction manager from a single
+    thread, but other threads may still call into it (for example, to
+    register synchronizers or to shut down data managers).  Swapping the
+    current transaction is serialized by a lock so that such calls
+    can't corrupt its state, even without a GIL.
     """
 
+    #: If not None, log a warning for each hook taking at least this
+    #: many seconds to run.  Assign it to the class to use it for all
+    #: managers, including those of a `ThreadTransactionManager`.
+    slow_hook_threshold = None
+
+    #: If not None, a `~transaction.CoordinatorLog` recording commit
+    #: decisions for recovery.  Assign it to the class to use it for
+    #: all managers, including those of a `ThreadTransactionManager`.
+    coordinator_log = None
+
+    #: If not None, the maximum number of entries in the
+    #: `~transaction.interfaces.ITransaction.cache` of transactions.
+    cache_size = None
+
+    #: The `~transaction.RetryRegistry` classifying errors as retryable
+    #: or not.  It is shared by all managers unless assigned to one.
+    retry_registry = RetryRegistry()
+
     def __init__(self, explicit=False):
         self.explicit = explicit
         self._txn = None
         self._synchs = WeakSet()
+        self._lock = threading.Lock()
+        self._hook_stats = _HookStats()
+
+    def _resetAfterFork(self):
+        # In a child process, forget the transaction and synchronizers
+        # inherited from the parent, without aborting anything: their
+        # data managers (and connections) belong to the parent.  The
+        # lock may have been held by another thread of the parent.
+        self._txn = None
+        self._synchs = WeakSet()
+        self._lock = threading.Lock()
+        self._hook_stats._resetAfterFork()
 
     def begin(self):
         """See `~transaction.interfaces.ITransactionManager`."""
@@ -74,7 +166,9 @@ class TransactionManager:
             if self.explicit:
                 raise AlreadyInTransaction()
             self._txn.abort()
-        txn = self._txn = Transaction(self._synchs, self)
+        txn = Transaction(self._synchs, self)
+        with self._lock:
+            self._txn = txn
         _new_transaction(txn, self._synchs)
         return txn
 
@@ -83,23 +177,31 @@ class TransactionManager:
 
     def get(self):
         """See `~transaction.interfaces.ITransactionManager`."""
-        if self._txn is None:
+        txn = self._txn
+        if txn is None:
             if self.explicit:
                 raise NoTransaction()
-            self._txn = Transaction(self._synchs, self)
-        return self._txn
+            # Only the (rare) creation path needs the lock; re-check
+            # under it so two threads can't both install a transaction.
+            with self._lock:
+                txn = self._txn
+                if txn is None:
+                    txn = self._txn = Transaction(self._synchs, self)
+        return txn
 
     def free(self, txn):
-        if txn is not self._txn:
-            raise ValueError("Foreign transaction")
-        self._txn = None
+        with self._lock:
+            if txn is not self._txn:
+                raise ValueError("Foreign transaction")
+            self._txn = None
 
     def registerSynch(self, synch):
         """ See `~transaction.interfaces.ITransactionManager`.
         """
         self._synchs.add(synch)
-        if self._txn is not None:
-            synch.newTransaction(self._txn)
+        txn = self._txn
+        if txn is not None:
+            synch.newTransaction(txn)
 
     def unregisterSynch(self, synch):
         """ See `~transaction.interfaces.ITransactionManager`.
@@ -116,6 +218,26 @@ class TransactionManager:
         """
         return bool(self._synchs)
 
+    def hookStats(self):
+        """Return timings of the hooks called by this manager's transactions.
+
+        The result maps the qualified name of each hook to a tuple
+        ``(calls, seconds)``: the number of times it was called and
+        the total time spent in it.
+        """
+        return self._hook_stats.get()
+
+    def clearHookStats(self):
+        """Forget the timings returned by `hookStats`."""
+        self._hook_stats.clear()
+
+    def _recordHookTime(self, txn, hook, seconds):
+        name = _hook_name(hook)
+        self._hook_stats.record(name, seconds)
+        threshold = self.slow_hook_threshold
+        if threshold is not None and seconds >= threshold:
+            txn.log.warning("Slow hook %s took %.3f seconds", name, seconds)
+
     def isDoomed(self):
         """ See `~transaction.interfaces.ITransactionManager`.
         """
@@ -161,8 +283,9 @@ class TransactionManager:
                 yield self
 
     def _retryable(self, error_type, error):
-        if issubclass(error_type, TransientError):
-            return True
+        retryable = self.retry_registry.classify(error_type)
+        if retryable is not None:
+            return retryable
 
         for dm in self.get()._resources:
             should_retry = getattr(dm, 'should_retry', None)
@@ -181,23 +304,7 @@ class TransactionManager:
         if tries <= 0:
             raise ValueError("tries must be > 0")
 
-        # These are ordinarily strings, but that's
-        # not required. A callable class could override them
-        # to anything.
-        name = func.__name__ or ''
-        doc = func.__doc__ or ''
-
-        if isinstance(name, bytes):
-            name = name.decode('UTF-8')
-        if isinstance(doc, bytes):
-            doc = doc.decode('UTF-8')
-
-        if name and name != '_':
-            if doc:
-                doc = name + '\n\n' + doc
-            else:
-                doc = name
-
+        doc = _describe(func)
         for try_no in itertools.count(1):
             txn = self.begin()
             if doc:
@@ -217,6 +324,185 @@ class TransactionManager:
                 else:
                     raise
 
+    async def arun(self, func, tries=3, backoff=0):
+        """See `~transaction.interfaces.ITransactionManager`."""
+        if tries <= 0:
+            raise ValueError("tries must be > 0")
+
+        doc = _describe(func)
+        for try_no in itertools.count(1):
+            txn = self.begin()
+            if doc:
+                txn.note(doc)
+            try:
+                result = await func()
+                self.commit()
+                return result
+            except BaseException as exc:
+                # Note: `abort` must not be called before `_retryable`
+                retry = (isinstance(exc, Exception)
+                         and try_no < tries
+                         and self._retryable(exc.__class__, exc))
+                self.abort()
+                if not retry:
+                    raise
+            await _backoff(backoff, try_no)
+
+    async def aattempts(self, number=3, backoff=0):
+        """See `~transaction.interfaces.ITransactionManager`."""
+        if number <= 0:
+            raise ValueError("number must be positive")
+        for try_no in range(1, number + 1):
+            if try_no < number:
+                attempt = Attempt(self)
+                yield attempt
+                if attempt.success:
+                    break
+                await _backoff(backoff, try_no)
+            else:
+                yield self
+
+    def submit(self, executor, func, *args, tries=3, **kw):
+        """See `~transaction.interfaces.ITransactionManager`."""
+        if tries <= 0:
+            raise ValueError("tries must be > 0")
+        txn = self._txn
+        if txn is None:
+            metadata = None
+        else:
+            metadata = (txn._user, txn.description,
+                        dict(txn.__dict__.get('extension') or ()))
+        return executor.submit(_runSubmitted, func, args, kw, tries,
+                               metadata)
+
+    def chunked(self, iterable, func, size=100, tries=3, savepoint=None,
+                latency=None):
+        """See `~transaction.interfaces.ITransactionManager`."""
+        sizer = None
+        if isinstance(size, BatchSizer):
+            if latency is not None:
+                raise ValueError("pass the latency to the BatchSizer")
+            sizer = size
+        elif size <= 0:
+            raise ValueError("size must be > 0")
+        if savepoint is not None and savepoint <= 0:
+            raise ValueError("savepoint must be > 0")
+        items = iter(iterable)
+        while True:
+            if sizer is not None:
+                size = sizer.size
+            batch = list(itertools.islice(items, size))
+            if not batch:
+                return
+            processed = None
+            attempts = 0
+
+            def _():
+                nonlocal processed, attempts
+                attempts += 1
+                if attempts > 1 and sizer is not None:
+                    # The previous attempt failed with a retriable error.
+                    sizer.conflicted()
+                results = []
+                for count, item in enumerate(batch, 1):
+                    results.append(func(item))
+                    if savepoint and count % savepoint == 0:
+                        self.savepoint(True)
+                processed = time.perf_counter()
+                return results
+
+            results = self.run(_, tries)
+            if sizer is not None:
+                sizer.committed(time.perf_counter() - processed)
+            elif latency is not None and len(batch) == size:
+                # Scale the batch size towards the one whose commit
+                # takes *latency* seconds, by a factor of 2 at most.
+                elapsed = time.perf_counter() - processed
+                factor = latency / elapsed if elapsed else 2
+                size = max(1, int(size * min(2, max(0.5, factor))))
+            yield results
+
+
+def _describe(func):
+    # The note added to transactions running *func*: its name (if it
+    # isn't '_') and docstring.
+
+    # These are ordinarily strings, but that's
+    # not required. A callable class could override them
+    # to anything.
+    name = func.__name__ or ''
+    doc = func.__doc__ or ''
+
+    if isinstance(name, bytes):
+        name = name.decode('UTF-8')
+    if isinstance(doc, bytes):
+        doc = doc.decode('UTF-8')
+
+    if name and name != '_':
+        if doc:
+            doc = name + '\n\n' + doc
+        else:
+            doc = name
+    return doc
+
+
+def _runSubmitted(func, args, kw, tries, metadata):
+    # Run a function submitted to an executor, in a worker thread or
+    # process.  This is a module-level function so it can be pickled.
+    import transaction
+    doc = _describe(func)
+
+    def _():
+        txn = transaction.get()
+        if metadata is not None:
+            user, description, extension = metadata
+            if user:
+                txn.user = user
+            if description:
+                txn.note(description)
+            txn.extension.update(extension)
+        if doc:
+            txn.note(doc)
+        return func(*args, **kw)
+
+    return transaction.manager.run(_, tries)
+
+
+async def _backoff(backoff, try_no):
+    # Wait before the next try, twice as long as before the previous.
+    if backoff:
+        import asyncio
+        await asyncio.sleep(backoff * 2 ** (try_no - 1))
+
+
+# Hooks called in child processes after forking, see addAfterForkHook.
+_after_fork_hooks = []
+
+
+def addAfterForkHook(hook, args=(), kws=None):
+    """Call ``hook(*args, **kws)`` in child processes after forking.
+
+    In the child, the default transaction manager
+    (``transaction.manager``) first forgets its transaction and
+    synchronizers, so that nothing is committed or aborted on behalf
+    of the parent.  Then the hooks are called, in the order they were
+    added, e.g. to have data managers drop the connections they
+    inherited.  Errors of hooks are logged.
+    """
+    if kws is None:
+        kws = {}
+    _after_fork_hooks.append((hook, tuple(args), kws))
+
+
+def _afterFork(manager):
+    # Called in child processes after forking.
+    manager._resetAfterFork()
+    for hook, args, kws in list(_after_fork_hooks):
+        try:
+            hook(*args, **kws)
+        except Exception:
+            logger.exception("Error in after fork hook %s", hook)
+
 
 @implementer(ITransactionManager)
 class ThreadTransactionManager(threading.local):
@@ -229,10 +515,25 @@ class ThreadTransactionManager(threading.local):
     Advanced applications can use the `manager` attribute to get a
     wrapped `TransactionManager` to allow cross-thread calls for
     graceful shutdown of data managers.
+
+    The `hookStats` of the managers of all threads are aggregated.
     """
 
+    # Unlike attributes, slots are shared by all threads.
+    __slots__ = ('_hook_stats',)
+
     def __init__(self):
+        # Called in each thread using this manager.
+        try:
+            hook_stats = self._hook_stats
+        except AttributeError:
+            hook_stats = self._hook_stats = _HookStats()
         self.manager = TransactionManager()
+        self.manager._hook_stats = hook_stats
+
+    def _resetAfterFork(self):
+        # Only the thread that forked exists in the child.
+        self.manager._resetAfterFork()
 
     @property
     def explicit(self):
@@ -242,6 +543,30 @@ class ThreadTransactionManager(threading.local):
     def explicit(self, v):
         self.manager.explicit = v
 
+    @property
+    def slow_hook_threshold(self):
+        return self.manager.slow_hook_threshold
+
+    @slow_hook_threshold.setter
+    def slow_hook_threshold(self, v):
+        self.manager.slow_hook_threshold = v
+
+    @property
+    def cache_size(self):
+        return self.manager.cache_size
+
+    @cache_size.setter
+    def cache_size(self, v):
+        self.manager.cache_size = v
+
+    @property
+    def retry_registry(self):
+        return self.manager.retry_registry
+
+    @retry_registry.setter
+    def retry_registry(self, v):
+        self.manager.retry_registry = v
+
     def begin(self):
         return self.manager.begin()
 
@@ -281,12 +606,32 @@ class ThreadTransactionManager(threading.local):
     def registeredSynchs(self):
         return self.manager.registeredSynchs()
 
+    def hookStats(self):
+        return self.manager.hookStats()
+
+    def clearHookStats(self):
+        return self.manager.clearHookStats()
+
     def attempts(self, number=3):
         return self.manager.attempts(number)
 
     def run(self, func=None, tries=3):
         return self.manager.run(func, tries)
 
+    def arun(self, func, tries=3, backoff=0):
+        return self.manager.arun(func, tries, backoff)
+
+    def aattempts(self, number=3, backoff=0):
+        return self.manager.aattempts(number, backoff)
+
+    def submit(self, executor, func, *args, tries=3, **kw):
+        return self.manager.submit(executor, func, *args, tries=tries, **kw)
+
+    def chunked(self, iterable, func, size=100, tries=3, savepoint=None,
+                latency=None):
+        return self.manager.chunked(iterable, func, size, tries, savepoint,
+                                    latency)
+
 
 class Attempt:
 
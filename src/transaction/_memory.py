@@ -0,0 +1,188 @@
+############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+"""A transactional in-memory mapping.
+"""
+import threading
+from collections.abc import MutableMapping
+
+from zope.interface import implementer
+
+from transaction import interfaces
+
+
+# Marks deleted keys in the changes.
+_deleted = object()
+# Marks keys that weren't changed in the undo log.
+_unchanged = object()
+
+
+@implementer(interfaces.ISavepointDataManager)
+class MemoryDataManager(MutableMapping):
+    """A mapping whose changes are committed with transactions.
+
+    Changes join the current transaction of *transaction_manager* (by
+    default, the thread-local ``transaction.manager``) and become
+    visible in `committed` when it commits; aborting forgets them.
+
+    Changes are kept separately from the committed data, with an undo
+    log, so that taking a savepoint takes constant time, and rolling
+    back to one, aborting or committing take time proportional to the
+    changes made (since the savepoint), whatever the size of the data.
+
+    An instance holds the changes of a single transaction at a time, so
+    use one per thread (or per transaction manager): changing it while
+    its changes belong to another transaction than the current one of
+    *transaction_manager* raises `ValueError`.
+
+    *name* is used as the `sortKey`; give data managers stable names
+    if they are used with a `~transaction.CoordinatorLog`.
+    """
+
+    def __init__(self, data=(), transaction_manager=None, name=None):
+        if transaction_manager is None:
+            import transaction
+            transaction_manager = transaction.manager
+        self.transaction_manager = transaction_manager
+        self.name = name
+        self._committed = dict(data)
+        # Lets other threads read the committed data (see committed)
+        # while a commit updates it.
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.transaction = None
+        self.tpc_phase = None
+        # key -> new value (or _deleted).
+        self._changes = {}
+        # (key, previous entry in _changes or _unchanged) pairs, to undo
+        # the changes in reverse order.
+        self._undo = []
+        # Keys in the undo log since the last savepoint: restoring their
+        # first logged entry is enough to roll back to that savepoint.
+        self._logged = set()
+
+    @property
+    def committed(self):
+        """A copy of the committed data."""
+        with self._lock:
+            return dict(self._committed)
+
+    # Mapping interface, for the data as changed in the transaction.
+
+    def __getitem__(self, key):
+        value = self._changes.get(key, self._committed.get(key, _deleted))
+        if value is _deleted:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._change(key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._change(key, _deleted)
+
+    def __contains__(self, key):
+        value = self._changes.get(key, self._committed.get(key, _deleted))
+        return value is not _deleted
+
+    def __iter__(self):
+        changes = self._changes
+        for key in list(self._committed):
+            if changes.get(key) is not _deleted:
+                yield key
+        for key, value in list(changes.items()):
+            if value is not _deleted and key not in self._committed:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def _change(self, key, value):
+        if self.tpc_phase is not None:
+            raise ValueError("Can't change data while committing")
+        transaction = self.transaction_manager.get()
+        if self.transaction is None:
+            self.transaction = transaction
+            transaction.join(self)
+        elif transaction is not self.transaction:
+            raise ValueError("Data manager has changes in another "
+                             "transaction")
+        if key not in self._logged:
+            self._logged.add(key)
+            self._undo.append((key, self._changes.get(key, _unchanged)))
+        self._changes[key] = value
+
+    # Data manager interface.
+
+    def abort(self, transaction):
+        self._reset()
+
+    def tpc_begin(self, transaction):
+        self.tpc_phase = 1
+
+    def commit(self, transaction):
+        pass
+
+    def tpc_vote(self, transaction):
+        self.tpc_phase = 2
+
+    def tpc_finish(self, transaction):
+        committed = self._committed
+        with self._lock:
+            for key, value in self._changes.items():
+                if value is _deleted:
+                    committed.pop(key, None)
+                else:
+                    committed[key] = value
+        self._reset()
+
+    def tpc_abort(self, transaction):
+        self._reset()
+
+    def sortKey(self):
+        if self.name is not None:
+            return self.name
+        return 'MemoryDataManager:%x' % id(self)
+
+    def savepoint(self):
+        # Later changes must be logged again, whether or not they were
+        # changed since the previous savepoint.
+        self._logged = set()
+        return MemorySavepoint(self, len(self._undo))
+
+    def _rollback(self, position):
+        changes = self._changes
+        undo = self._undo
+        while len(undo) > position:
+            key, previous = undo.pop()
+            if previous is _unchanged:
+                del changes[key]
+            else:
+                changes[key] = previous
+        self._logged = set()
+
+
+@implementer(interfaces.IDataManagerSavepoint)
+class MemorySavepoint:
+    """A savepoint of a `MemoryDataManager`: a position in its undo log."""
+
+    def __init__(self, data_manager, position):
+        self.data_manager = data_manager
+        self.position = position
+
+    def rollback(self):
+        self.data_manager._rollback(self.position)
@@ -0,0 +1,280 @@
+############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+"""Sending messages if, and only if, transactions commit.
+"""
+import logging
+import threading
+
+from zope.interface import implementer
+
+from transaction import interfaces
+
+
+logger = logging.getLogger(__name__)
+
+
+@implementer(interfaces.IOutboxStore)
+class SQLiteOutboxStore:
+    """An `~transaction.interfaces.IOutboxStore` kept in a SQLite database.
+
+    *path* is the database file, which may be shared with other uses.
+    Writes are synced to disk before returning.
+    """
+
+    def __init__(self, path):
+        # Not imported with the module: sqlite3 is optional, and slow
+        # to import.
+        import sqlite3
+        self.path = path
+        # Used by the committing threads and the dispatcher.
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=FULL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS transaction_outbox ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' tid TEXT NOT NULL,'
+            ' committed INTEGER NOT NULL DEFAULT 0,'
+            ' destination TEXT NOT NULL,'
+            ' payload BLOB NOT NULL)')
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS transaction_outbox_tid'
+            ' ON transaction_outbox (tid)')
+
+    def _write(self, statement, parameters=()):
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                if isinstance(parameters, list):
+                    self._db.executemany(statement, parameters)
+                else:
+                    self._db.execute(statement, parameters)
+            except:  # noqa: E722 do not use bare 'except'
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def stage(self, transaction_id, messages):
+        """See `~transaction.interfaces.IOutboxStore`."""
+        self._write(
+            'INSERT INTO transaction_outbox (tid, destination, payload)'
+            ' VALUES (?, ?, ?)',
+            [(transaction_id, destination, bytes(payload))
+             for destination, payload in messages])
+
+    def commit(self, transaction_id):
+        """See `~transaction.interfaces.IOutboxStore`."""
+        self._write('UPDATE transaction_outbox SET committed = 1'
+                    ' WHERE tid = ?', (transaction_id,))
+
+    def discard(self, transaction_id):
+        """See `~transaction.interfaces.IOutboxStore`."""
+        self._write('DELETE FROM transaction_outbox'
+                    ' WHERE tid = ? AND committed = 0', (transaction_id,))
+
+    def pending(self, limit):
+        """See `~transaction.interfaces.IOutboxStore`."""
+        with self._lock:
+            return self._db.execute(
+                'SELECT id, destination, payload FROM transaction_outbox'
+                ' WHERE committed = 1 ORDER BY id LIMIT ?',
+                (limit,)).fetchall()
+
+    def delivered(self, ids):
+        """See `~transaction.interfaces.IOutboxStore`."""
+        self._write('DELETE FROM transaction_outbox WHERE id = ?',
+                    [(id,) for id in ids])
+
+    def inDoubt(self):
+        """See `~transaction.interfaces.IOutboxStore`."""
+        with self._lock:
+            return [tid for tid, in self._db.execute(
+                'SELECT DISTINCT tid FROM transaction_outbox'
+                ' WHERE committed = 0')]
+
+    def close(self):
+        """See `~transaction.interfaces.IOutboxStore`."""
+        with self._lock:
+            self._db.close()
+
+
+class Outbox:
+    """Deliver the messages sent by committed transactions.
+
+    Messages are sent in transactions with an `OutboxDataManager`,
+    and staged in *store* (an `~transaction.interfaces.IOutboxStore`)
+    when the transaction votes, so they survive a crash after it
+    commits.  Once `started <start>`, a background thread delivers the
+    messages of committed transactions by calling *deliver* with lists
+    of up to *batch_size* ``(destination, payload)`` pairs, oldest
+    first.  It is woken up by commits, and retries every *interval*
+    seconds if *deliver* fails.
+
+    Messages are forgotten once *deliver* returns, so they are
+    delivered at least once: they may be delivered again if the
+    process dies before that.
+    """
+
+    def __init__(self, store, deliver, batch_size=100, interval=1.0):
+        self.store = store
+        self.deliver = deliver
+        self.batch_size = batch_size
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start delivering messages in a background thread."""
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='transaction-outbox', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop delivering messages."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wake(self):
+        """Have the background thread deliver messages now."""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to deliver messages")
+
+    def flush(self):
+        """Deliver all deliverable messages now.
+
+        Return the number of messages delivered.
+        """
+        count = 0
+        while True:
+            batch = self.store.pending(self.batch_size)
+            if not batch:
+                return count
+            self.deliver([(destination, payload)
+                          for _, destination, payload in batch])
+            self.store.delivered([id for id, _, _ in batch])
+            count += len(batch)
+
+
+@implementer(interfaces.ISavepointDataManager,
+             interfaces.IRecoverableDataManager)
+class OutboxDataManager:
+    """Send messages through an `Outbox` when transactions commit.
+
+    Messages `sent <send>` join the current transaction of
+    *transaction_manager* (by default, the thread-local
+    ``transaction.manager``).  Delivery doesn't add latency to
+    ``commit``: it's left to the outbox's background thread.
+
+    An instance holds the messages of a single transaction at a time,
+    so use one per thread (or per transaction manager): sending while
+    its messages belong to another transaction than the current one of
+    *transaction_manager* raises `ValueError`.
+
+    *name* is used as the `sortKey`; give data managers stable names
+    if they are used with a `~transaction.CoordinatorLog`.
+    """
+
+    def __init__(self, outbox, transaction_manager=None, name=None):
+        if transaction_manager is None:
+            import transaction
+            transaction_manager = transaction.manager
+        self.outbox = outbox
+        self.transaction_manager = transaction_manager
+        self.name = name
+        self._reset()
+
+    def _reset(self):
+        self.transaction = None
+        self._messages = []
+        self._tid = None
+
+    def send(self, destination, payload):
+        """Send *payload* (bytes) to *destination* (text) if the current
+        transaction commits."""
+        if self._tid is not None:
+            raise ValueError("Can't send messages while committing")
+        transaction = self.transaction_manager.get()
+        if self.transaction is None:
+            self.transaction = transaction
+            transaction.join(self)
+        elif transaction is not self.transaction:
+            raise ValueError("Data manager has messages in another "
+                             "transaction")
+        self._messages.append((destination, bytes(payload)))
+
+    def abort(self, transaction):
+        self._reset()
+
+    def tpc_begin(self, transaction):
+        pass
+
+    def commit(self, transaction):
+        pass
+
+    def tpc_vote(self, transaction):
+        if self._messages:
+            self._tid = transaction.id
+            self.outbox.store.stage(self._tid, self._messages)
+
+    def tpc_finish(self, transaction):
+        if self._tid is not None:
+            self.outbox.store.commit(self._tid)
+            self.outbox.wake()
+        self._reset()
+
+    def tpc_abort(self, transaction):
+        if self._tid is not None:
+            self.outbox.store.discard(self._tid)
+        self._reset()
+
+    def sortKey(self):
+        if self.name is not None:
+            return self.name
+        return 'OutboxDataManager:%x' % id(self)
+
+    def recover(self, transaction_id):
+        """See `~transaction.interfaces.IRecoverableDataManager`."""
+        self.outbox.store.commit(transaction_id)
+        self.outbox.wake()
+
+    def savepoint(self):
+        return OutboxSavepoint(self, len(self._messages))
+
+
+@implementer(interfaces.IDataManagerSavepoint)
+class OutboxSavepoint:
+
+    def __init__(self, data_manager, count):
+        self.data_manager = data_manager
+        self.count = count
+
+    def rollback(self):
+        del self.data_manager._messages[self.count:]
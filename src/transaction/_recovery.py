@@ -0,0 +1,298 @@
+############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+"""A durable log of commit decisions, for recovery of two-phase commits.
+
+If a process dies (or a data manager fails) after all data managers
+voted to commit but before all of them finished, some of them are left
+"in doubt": they promised to commit, but were never told to.  A
+`CoordinatorLog` records the decision to commit, so that a recovery
+process can finish these commits later.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+
+logger = logging.getLogger(__name__)
+
+# Each record is a header (payload length, CRC-32 of the payload)
+# followed by a JSON payload.  A torn write at the end of the file is
+# detected by a short payload or a CRC mismatch.
+_HEADER = struct.Struct('>II')
+
+_fsync = getattr(os, 'fdatasync', os.fsync)
+
+
+class _GroupSync:
+    # Syncing a file for several threads at once.  Subclasses write to
+    # the file descriptor ``_fd`` and count the bytes written in
+    # ``_written``.
+
+    def _init_sync(self):
+        # Serializes syncing; waiters are notified when a sync finishes.
+        self._synced_cond = threading.Condition(threading.Lock())
+        self._syncing = False
+        # How many bytes were written, and how many of them are known
+        # to be on disk.  These only ever grow, even across compaction.
+        self._written = self._synced = 0
+
+    def sync(self):
+        """Make sure everything written so far is on disk."""
+        self._sync(self._written)
+
+    def _sync(self, position):
+        # Group commit: a single thread syncs everything written so far,
+        # while threads needing (part of) that wait for it to finish.
+        cond = self._synced_cond
+        with cond:
+            while self._synced < position:
+                if self._syncing:
+                    cond.wait()
+                    continue
+                self._syncing = True
+                target = self._written
+                cond.release()
+                try:
+                    _fsync(self._fd)
+                finally:
+                    cond.acquire()
+                    self._syncing = False
+                    cond.notify_all()
+                self._synced = max(self._synced, target)
+
+
+class CoordinatorLog(_GroupSync):
+    """An append-only file recording two-phase commit decisions.
+
+    Assign an instance to the ``coordinator_log`` attribute of a
+    `~transaction.TransactionManager` (or of the class, to use it for
+    all managers).  When all data managers joined to a transaction
+    have voted, the transaction durably records its id and the
+    `~transaction.interfaces.IDataManager.sortKey` of each data manager
+    before calling ``tpc_finish`` on any of them.  Once all of them
+    finished, that is recorded too (lazily: losing this record only
+    means that recovery finishes an already finished transaction
+    again).
+
+    Writing the decision needs the log to be synced to disk.  Commits
+    made concurrently by several threads share a single sync, so the
+    cost of keeping the log on is amortized.  The commits in doubt are
+    also kept in memory, and the log is `compacted <compact>` once
+    *compact_after* commits finished since it was last compacted
+    (unless *compact_after* is None), so it doesn't grow forever.
+
+    After a crash, call `recover` with the data managers to finish the
+    commits that are still in doubt.
+    """
+
+    def __init__(self, path, compact_after=1000):
+        self.path = path
+        self.compact_after = compact_after
+        # Serializes appends (and compaction), and updates of the
+        # commits in doubt.
+        self._lock = threading.Lock()
+        self._init_sync()
+        self._fd = None
+        self._open()
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        records, end = self._scan(fd)
+        if end != os.fstat(fd).st_size:
+            # Drop a torn write at the end.
+            os.ftruncate(fd, end)
+        self._fd = fd
+        # tid -> commit record, for the commits in doubt.
+        self._in_doubt = {}
+        for record in records:
+            self._add(record)
+        # Finished commits recorded since the last compaction.
+        self._finished = 0
+
+    def _add(self, record):
+        if record['op'] == 'commit':
+            self._in_doubt[record['tid']] = record
+        else:
+            self._in_doubt.pop(record['tid'], None)
+
+    def close(self):
+        """Close the log file."""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def logCommit(self, transaction, resources, transactions=None):
+        """Durably record the decision to commit *transaction*.
+
+        *resources* are the data managers that voted to commit.  If the
+        commit spans several transactions (see `~transaction.Coordinator`),
+        *transactions* are the ones the *resources* joined, in the same
+        order; their ids are recorded to be passed to the data managers
+        when recovering.
+
+        Return the transaction's `~transaction.interfaces.ITransaction.id`,
+        which identifies the commit in the log.
+        """
+        tid = transaction.id
+        keys = [_sort_key(rm) for rm in resources]
+        record = {'op': 'commit', 'tid': tid, 'rms': keys}
+        if transactions is not None:
+            tids = {key: txn.id for key, txn in zip(keys, transactions)
+                    if txn.id != tid}
+            if tids:
+                record['tids'] = tids
+        self._sync(self._append(record))
+        return tid
+
+    def logCommitted(self, tid):
+        """Record that all data managers finished committing *tid*.
+
+        The record isn't synced; the next sync will include it.
+        """
+        self._append({'op': 'done', 'tid': tid})
+        if (self.compact_after is not None
+                and self._finished >= self.compact_after):
+            self.compact()
+
+    def inDoubt(self):
+        """Return the commits that may not have been finished.
+
+        The result maps the ids of the transactions to the lists of
+        the sort keys of their data managers.
+        """
+        with self._lock:
+            return {tid: record['rms']
+                    for tid, record in self._in_doubt.items()}
+
+    def recover(self, participants):
+        """Finish the commits that are in doubt.
+
+        *participants* are data managers; those providing
+        `~transaction.interfaces.IRecoverableDataManager` are asked to
+        finish the in-doubt commits they took part in, which are found
+        by their ``sortKey``, with the id of the transaction they
+        joined.  A transaction is no longer in doubt once all of its
+        data managers were recovered.
+
+        Return the ids of the transactions still in doubt, because some
+        of their data managers weren't given, don't support recovery
+        or failed to recover.
+        """
+        by_key = {_sort_key(rm): rm for rm in participants}
+        remaining = []
+        with self._lock:
+            in_doubt = list(self._in_doubt.items())
+        for tid, record in in_doubt:
+            tids = record.get('tids', {})
+            done = True
+            for key in record['rms']:
+                recover = getattr(by_key.get(key), 'recover', None)
+                if recover is None:
+                    done = False
+                    continue
+                joined = tids.get(key, tid)
+                try:
+                    recover(joined)
+                except Exception:
+                    logger.error("Failed to recover transaction %s on %s",
+                                 joined, by_key[key], exc_info=True)
+                    done = False
+            if done:
+                self.logCommitted(tid)
+            else:
+                remaining.append(tid)
+        self.sync()
+        return remaining
+
+    def compact(self):
+        """Rewrite the log, keeping only the commits in doubt."""
+        with self._lock, self._synced_cond:
+            while self._syncing:
+                self._synced_cond.wait()
+            tmp = self.path + '.tmp'
+            with open(tmp, 'wb') as f:
+                for record in self._in_doubt.values():
+                    f.write(_encode(record))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            _sync_directory(self.path)
+            os.close(self._fd)
+            self._open()
+            # Everything that's left was just synced.
+            self._synced = self._written
+
+    def _append(self, record):
+        data = _encode(record)
+        with self._lock:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self._fd, view):]
+            self._written += len(data)
+            self._add(record)
+            if record['op'] == 'done':
+                self._finished += 1
+            return self._written
+
+    @staticmethod
+    def _scan(fd):
+        # Return the valid records in the file and the offset of their end.
+        records = []
+        size = os.fstat(fd).st_size
+        if not size:
+            return records, 0
+        pos = 0
+        with mmap.mmap(fd, size, access=mmap.ACCESS_READ) as m:
+            while pos + _HEADER.size <= size:
+                length, crc = _HEADER.unpack_from(m, pos)
+                start = pos + _HEADER.size
+                end = start + length
+                if end > size:
+                    break
+                data = m[start:end]
+                if zlib.crc32(data) != crc:
+                    break
+                records.append(json.loads(data))
+                pos = end
+        return records, pos
+
+
+def _encode(record):
+    data = json.dumps(record, separators=(',', ':')).encode('utf-8')
+    return _HEADER.pack(len(data), zlib.crc32(data)) + data
+
+
+def _sort_key(rm):
+    func = getattr(rm, 'sortKey', None)
+    if func is not None:
+        return func()
+
+
+def _sync_directory(path):
+    # Make a rename durable.
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:  # pragma: no cover
+        return
+    try:
+        os.fsync(fd)
+    except OSError:  # pragma: no cover
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,81 @@
+############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+"""Classifying errors as retryable or not.
+"""
+import threading
+
+from transaction.interfaces import TransientError
+
+
+# Forget the classifications when there are more, in case exception
+# types are created dynamically.
+_MAX_CACHED = 1000
+
+
+class RetryRegistry:
+    """Exception types declared retryable or not.
+
+    Transaction managers consult their registry when an error occurs in
+    a transaction they run (see
+    `~transaction.interfaces.ITransactionManager.run`).  An exception
+    type is classified by the nearest class in its method resolution
+    order that was `declared <declare>`, and the classification is
+    cached per type.  Only errors of types classified by no declaration
+    are passed to the ``should_retry`` method of the data managers
+    (see `~transaction.interfaces.IRetryDataManager`).
+
+    `~transaction.interfaces.TransientError` is declared retryable when
+    the registry is created.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._declared = {TransientError: True}
+        self._cache = {}
+
+    def declare(self, error_type, retryable=True):
+        """Declare errors of *error_type* (and its subclasses) to be
+        *retryable* or not, unless a subclass is declared otherwise."""
+        with self._lock:
+            self._declared[error_type] = bool(retryable)
+            self._cache = {}
+
+    def forget(self, error_type):
+        """Forget the declaration of *error_type*."""
+        with self._lock:
+            del self._declared[error_type]
+            self._cache = {}
+
+    def classify(self, error_type):
+        """Return whether errors of *error_type* are retryable.
+
+        Return None if neither the type nor any of its bases was
+        declared.
+        """
+        cache = self._cache
+        try:
+            return cache[error_type]
+        except KeyError:
+            pass
+        declared = self._declared
+        for cls in error_type.__mro__:
+            if cls in declared:
+                retryable = declared[cls]
+                break
+        else:
+            retryable = None
+        if len(cache) >= _MAX_CACHED:
+            cache.clear()
+        cache[error_type] = retryable
+        return retryable
@@ -11,9 +11,13 @@
 # FOR A PARTICULAR PURPOSE.
 #
 ############################################################################
+import bisect
+import contextlib
 import logging
+import os
 import sys
 import threading
+import time
 import traceback
 import warnings
 import weakref
@@ -22,11 +26,13 @@ from io import StringIO
 from zope.interface import implementer
 
 from transaction import interfaces
+from transaction._cache import TransactionCache
 from transaction.interfaces import TransactionFailedError
 from transaction.weakset import WeakSet
 
 
 _marker = object()
+_batch_marker = object()
 
 _TB_BUFFER = None  # unittests may hook
 
@@ -38,6 +44,11 @@ def _makeTracebackBuffer():  # pragma NO COVER
 
 
 _LOGGER = None  # unittests may hook
+# The parent of the per-thread loggers.
+_TXN_LOGGER = logging.getLogger("txn")
+
+# The running transaction.Watchdog, if any.
+_WATCHDOG = None
 
 
 def _makeLogger():  # pragma NO COVER
@@ -46,6 +57,35 @@ def _makeLogger():  # pragma NO COVER
     return logging.getLogger("txn.%d" % threading.get_ident())
 
 
+# Transaction ids: the creation time in nanoseconds since the epoch
+# (forced to increase within the process) and the process id, both in
+# fixed-width hex so that ids sort by creation time.
+_id_lock = threading.Lock()
+_id_last_time = 0
+_id_pid = os.getpid()
+
+
+def _new_id_time():
+    global _id_last_time
+    now = time.time_ns()
+    with _id_lock:
+        if now <= _id_last_time:
+            now = _id_last_time + 1
+        _id_last_time = now
+    return now
+
+
+def _reset_id_pid():
+    global _id_pid, _id_lock
+    _id_pid = os.getpid()
+    # Another thread may have held the lock when the process forked.
+    _id_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):  # pragma: no branch
+    os.register_at_fork(after_in_child=_reset_id_pid)
+
+
 class Status:
     # ACTIVE is the initial state.
     ACTIVE = "Active"
@@ -60,6 +100,121 @@ class Status:
     COMMITFAILED = "Commit failed"
 
 
+class Outcome:
+    """The outcomes of the data managers in a commit.
+
+    See `Transaction.outcomes`.
+    """
+
+    # tpc_finish succeeded: the changes were made permanent.
+    FINISHED = "Finished"
+
+    # tpc_finish raised an exception: the state of the data manager is
+    # unknown.
+    FAILED = "Failed"
+
+    # The data manager was aborted without calling tpc_finish.
+    ABORTED = "Aborted"
+
+
+class _Hooks(list):
+    """A list of ``(hook, args, kws)`` triples kept in call order.
+
+    Hooks are sorted by their *order* (lowest first); hooks with equal
+    *order* keep their registration order.  While the hooks are being
+    called (see `Transaction._call_hooks`), a hook registered by a
+    running hook is never placed before a hook that has already run,
+    so it is always called too.
+
+    Hooks registered with a *key* are coalesced: registering again
+    with the same key before the hook has been called replaces the
+    earlier registration in place.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Parallel to the list itself: the order of each entry.
+        self._orders = []
+        # Index of the first hook that has not been called yet.
+        self._pending = 0
+        # key -> index of the hook registered with that key.
+        self._keys = {}
+
+    def pending(self, key):
+        """Return the index of the hook registered with *key*.
+
+        Return None if there is none or if it has already been called.
+        """
+        index = self._keys.get(key)
+        if index is not None and index >= self._pending:
+            return index
+
+    def add(self, hook, args, kws, order=0, key=None):
+        if key is not None:
+            index = self.pending(key)
+            if index is not None:
+                # Still waiting to be called: last registration wins,
+                # but the hook keeps its place.
+                self[index] = (hook, args, kws)
+                return
+        orders = self._orders
+        if not orders or order >= orders[-1]:
+            # The common case: no (or ascending) ordering.
+            index = len(orders)
+            orders.append(order)
+            super().append((hook, args, kws))
+        else:
+            index = bisect.bisect_right(orders, order, self._pending)
+            orders.insert(index, order)
+            self.insert(index, (hook, args, kws))
+            keys = self._keys
+            for k, i in keys.items():
+                if i >= index:
+                    keys[k] = i + 1
+        if key is not None:
+            self._keys[key] = index
+
+    def append(self, entry):
+        self.add(*entry)
+
+    def clear(self):
+        super().clear()
+        self._orders.clear()
+        self._keys.clear()
+        self._pending = 0
+
+
+class _lazy:
+    """An attribute created when first used.
+
+    The first access stores ``factory()`` in the instance, which then
+    finds it directly.  Code that only needs to know whether there is
+    anything in it can look in the instance's ``__dict__`` instead, so
+    transactions that never use it never pay for creating it.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, inst, owner=None):
+        if inst is None:
+            return self
+        value = inst.__dict__[self.name] = self.factory()
+        return value
+
+
+# The attributes holding hooks, see Transaction._hooks.
+_HOOK_NAMES = ('_before_commit', '_after_commit',
+               '_before_abort', '_after_abort')
+
+
+# Used instead of a lock by transactions no other thread works in.
+_noLock = contextlib.nullcontext()
+
+
 class _NoSynchronizers:
 
     @staticmethod
@@ -80,13 +235,65 @@ class Transaction:
     # savepoint to its index (see above).
     _savepoint2index = None
 
-    # Meta data. extended_info is also metadata, but is initialized to an
-    # empty dict in __init__.
+    # (resource, Outcome) pairs, set when resources are committed or
+    # cleaned up after a failure.
+    outcomes = ()
+
+    # The text of the id, computed when first needed.
+    _id = None
+
+    # The Watchdog watching us, if any.
+    _watchdog = None
+
+    # Meta data. extended_info is also metadata, see extension below.
     _user = ""
     _description = ""
+    # Texts noted since the description was last read or set, see note().
+    _notes = None
+
+    # The TransactionCache, see the cache property.
+    _cache = None
+
+    # Serializes joins and hook registrations once other threads may
+    # make them, see forkContext().
+    _lock = _noLock
+    # The ForkContexts whose workers must finish before we complete.
+    _forks = ()
+
+    # Most transactions never join a resource manager or register a
+    # hook, so the following are only created when first used.
+
+    # _adapters: Connection/_p_jar -> MultiObjectResourceAdapter[Sub]
+    _adapters = _lazy(dict)
+    # id(Connection) -> boolean, True if voted.  _voted and other
+    # dictionaries use the id() of the resource manager as a key,
+    # because we can't guess whether the actual resource managers will
+    # be safe to use as dict keys.
+    _voted = _lazy(dict)
+
+    # The user, description, and extension attributes are accessed
+    # directly by storages, leading underscore notwithstanding.
+    extension = _lazy(dict)
+
+    # The logger for this transaction (and thread).
+    log = _lazy(_makeLogger)
+
+    # List of (hook, args, kws) tuples added by addBeforeCommitHook().
+    _before_commit = _lazy(_Hooks)
+
+    # List of (hook, args, kws) tuples added by addAfterCommitHook().
+    _after_commit = _lazy(_Hooks)
+
+    # List of (hook, args, kws) tuples added by addBeforeAbortHook().
+    _before_abort = _lazy(_Hooks)
+
+    # List of (hook, args, kws) tuples added by addAfterAbortHook().
+    _after_abort = _lazy(_Hooks)
 
     def __init__(self, synchronizers=None, manager=None):
         self.status = Status.ACTIVE
+        self._id_time = _new_id_time()
+        self._id_pid = _id_pid
         # List of resource managers, e.g. MultiObjectResourceAdapters.
         self._resources = []
 
@@ -97,36 +304,17 @@ class Transaction:
 
         self._manager = manager
 
-        # _adapters: Connection/_p_jar -> MultiObjectResourceAdapter[Sub]
-        self._adapters = {}
-        self._voted = {}  # id(Connection) -> boolean, True if voted
-        # _voted and other dictionaries use the id() of the resource
-        # manager as a key, because we can't guess whether the actual
-        # resource managers will be safe to use as dict keys.
-
-        # The user, description, and extension attributes are accessed
-        # directly by storages, leading underscore notwithstanding.
-        self.extension = {}
-
-        self.log = _makeLogger()
-        self.log.debug("new transaction")
+        self._debug("new transaction")
 
         # If a commit fails, the traceback is saved in _failure_traceback.
         # If another attempt is made to commit, TransactionFailedError is
         # raised, incorporating this traceback.
         self._failure_traceback = None
 
-        # List of (hook, args, kws) tuples added by addBeforeCommitHook().
-        self._before_commit = []
-
-        # List of (hook, args, kws) tuples added by addAfterCommitHook().
-        self._after_commit = []
-
-        # List of (hook, args, kws) tuples added by addBeforeAbortHook().
-        self._before_abort = []
-
-        # List of (hook, args, kws) tuples added by addAfterAbortHook().
-        self._after_abort = []
+        watchdog = _WATCHDOG
+        if watchdog is not None:
+            self._watchdog = watchdog
+            watchdog.watch(self)
 
     @property
     def _extension(self):
@@ -138,6 +326,14 @@ class Transaction:
     def _extension(self, v):
         self.extension = v
 
+    @property
+    def id(self):
+        """See `~transaction.interfaces.ITransaction`."""
+        id = self._id
+        if id is None:
+            id = self._id = '%016x%08x' % (self._id_time, self._id_pid)
+        return id
+
     @property
     def user(self):
         return self._user
@@ -150,12 +346,26 @@ class Transaction:
 
     @property
     def description(self):
+        notes = self._notes
+        if notes is not None:
+            self._description = "\n".join(notes)
+            self._notes = None
         return self._description
 
     @description.setter
     def description(self, v):
         if v is not None:
             self._description = text_or_warn(v)
+            self._notes = None
+
+    @property
+    def cache(self):
+        """See `~transaction.interfaces.ITransaction`."""
+        cache = self._cache
+        if cache is None:
+            maxsize = getattr(self._manager, 'cache_size', None)
+            cache = self._cache = TransactionCache(maxsize)
+        return cache
 
     def isDoomed(self):
         """See `~transaction.interfaces.ITransaction`."""
@@ -181,6 +391,10 @@ class Transaction:
 
     def join(self, resource):
         """See `~transaction.interfaces.ITransaction`."""
+        with self._lock:
+            self._join(resource)
+
+    def _join(self, resource):
         if self.status is Status.COMMITFAILED:
             self._prior_operation_failed()  # doesn't return
 
@@ -245,6 +459,9 @@ class Transaction:
             if i > index:
                 savepoint.transaction = None  # invalidate
                 del savepoint2index[savepoint]
+        if self._cache is not None:
+            # Cached values may depend on what is rolled back.
+            self._cache.clear()
 
     # Invalidate and forget about all savepoints.
     def _invalidate_all_savepoints(self):
@@ -254,16 +471,7 @@ class Transaction:
 
     def commit(self):
         """See `~transaction.interfaces.ITransaction`."""
-        if self.status is Status.DOOMED:
-            raise interfaces.DoomedTransaction(
-                'transaction doomed, cannot commit')
-
-        if self._savepoint2index:
-            self._invalidate_all_savepoints()
-
-        if self.status is Status.COMMITFAILED:
-            self._prior_operation_failed()  # doesn't return
-
+        self._checkCommittable()
         self._callBeforeCommitHooks()
 
         self._synchronizers.map(lambda s: s.beforeCompletion(self))
@@ -286,7 +494,26 @@ class Transaction:
             self._synchronizers.map(lambda s: s.afterCompletion(self))
             self._callAfterCommitHooks(status=True)
             self._free()
-        self.log.debug("commit")
+        self._debug("commit")
+
+    def _checkCommittable(self):
+        if self._forks:
+            self._waitForWorkers()
+
+        if self._watchdog is not None:
+            # From now on, the watchdog must not doom the transaction:
+            # if it did so before, we see it below.
+            self._watchdog.committing(self)
+
+        if self.status is Status.DOOMED:
+            raise interfaces.DoomedTransaction(
+                'transaction doomed, cannot commit')
+
+        if self._savepoint2index:
+            self._invalidate_all_savepoints()
+
+        if self.status is Status.COMMITFAILED:
+            self._prior_operation_failed()  # doesn't return
 
     def _saveAndGetCommitishError(self):
         self.status = Status.COMMITFAILED
@@ -321,29 +548,58 @@ class Transaction:
         """See `~transaction.interfaces.ITransaction`."""
         return iter(self._before_commit)
 
-    def addBeforeCommitHook(self, hook, args=(), kws=None):
+    def addBeforeCommitHook(self, hook, args=(), kws=None, order=0, key=None):
         """See `~transaction.interfaces.ITransaction`."""
         if kws is None:
             kws = {}
-        self._before_commit.append((hook, tuple(args), kws))
+        with self._lock:
+            self._before_commit.add(hook, tuple(args), kws, order, key)
+
+    def getBeforeCommitBatch(self, hook, key=None, order=0):
+        """See `~transaction.interfaces.ITransaction`."""
+        # Batches are keyed hook registrations whose only argument is
+        # the batch.  Once the hook has been called, items added (e.g.
+        # by a later hook) go to a new batch with a new registration.
+        key = (_batch_marker, hook if key is None else key)
+        with self._lock:
+            hooks = self._before_commit
+            index = hooks.pending(key)
+            if index is not None:
+                return hooks[index][1][0]
+            batch = []
+            hooks.add(hook, (batch,), {}, order, key)
+            return batch
+
+    def _debug(self, msg):
+        # Looking up the per-thread logger only to drop the message
+        # costs more than the rest of a transaction that does nothing.
+        if ('log' in self.__dict__ or _LOGGER is not None
+                or _TXN_LOGGER.isEnabledFor(logging.DEBUG)):
+            self.log.debug(msg)
+
+    def _hooks(self, name):
+        # The hooks registered in the attribute *name*, without creating
+        # an empty list if there are none.
+        return self.__dict__.get(name, ())
 
     def _callBeforeCommitHooks(self):
         # Call all hooks registered, allowing further registrations
         # during processing.
-        self._call_hooks(self._before_commit)
+        self._call_hooks(self._hooks('_before_commit'))
 
     def getAfterCommitHooks(self):
         """See `~transaction.interfaces.ITransaction`."""
         return iter(self._after_commit)
 
-    def addAfterCommitHook(self, hook, args=(), kws=None):
+    def addAfterCommitHook(self, hook, args=(), kws=None, order=0, key=None):
         """See `~transaction.interfaces.ITransaction`."""
         if kws is None:
             kws = {}
-        self._after_commit.append((hook, tuple(args), kws))
+        with self._lock:
+            self._after_commit.add(hook, tuple(args), kws, order, key)
 
     def _callAfterCommitHooks(self, status=True):
-        self._call_hooks(self._after_commit,
+        self._call_hooks(self._hooks('_after_commit'),
                          exc=False, clean=True, prefix_args=(status,))
 
     def _call_hooks(self, hooks, exc=True, clean=False, prefix_args=()):
@@ -359,15 +615,20 @@ class Transaction:
         *prefix_args* defines additional arguments prefixed
         to the arguments provided by the hook definition.
 
-        ``_call_hooks`` supports that a hook adds new hooks.
+        ``_call_hooks`` supports that a hook adds new hooks; *hooks*
+        (a `_Hooks`) places them after the hook being called.
         """
         # Avoid to abort anything at the end if no hooks are registered.
         if not hooks:
             return
+        # Let the manager (if it cares) keep per-hook timings.
+        record = getattr(self._manager, '_recordHookTime', None)
         try:
             # Call all hooks registered, allowing further registrations
             # during processing
-            for hook, args, kws in hooks:
+            for index, (hook, args, kws) in enumerate(hooks):
+                hooks._pending = index + 1
+                start = time.perf_counter()
                 try:
                     hook(*(prefix_args + args), **kws)
                 except:  # noqa: E722 do not use bare 'except'
@@ -376,8 +637,11 @@ class Transaction:
                     # We should not fail
                     self.log.error("Error in hook exec in %s ",
                                    hook, exc_info=sys.exc_info())
+                finally:
+                    if record is not None:
+                        record(self, hook, time.perf_counter() - start)
         finally:
-            del hooks[:]  # clear hooks
+            hooks.clear()
             if clean:
                 # The primary operation has already been performed.
                 # But the hooks execution might have left the resources
@@ -394,71 +658,41 @@ class Transaction:
         """See `~transaction.interfaces.ITransaction`."""
         return iter(self._before_abort)
 
-    def addBeforeAbortHook(self, hook, args=(), kws=None):
+    def addBeforeAbortHook(self, hook, args=(), kws=None, order=0, key=None):
         """See `~transaction.interfaces.ITransaction`."""
         if kws is None:
             kws = {}
-        self._before_abort.append((hook, tuple(args), kws))
+        with self._lock:
+            self._before_abort.add(hook, tuple(args), kws, order, key)
 
     def _callBeforeAbortHooks(self):
         # Call all hooks registered, allowing further registrations
         # during processing.
-        self._call_hooks(self._before_abort, exc=False)
+        self._call_hooks(self._hooks('_before_abort'), exc=False)
 
     def getAfterAbortHooks(self):
         """See `~transaction.interfaces.ITransaction`."""
         return iter(self._after_abort)
 
-    def addAfterAbortHook(self, hook, args=(), kws=None):
+    def addAfterAbortHook(self, hook, args=(), kws=None, order=0, key=None):
         """See `~transaction.interfaces.ITransaction`."""
         if kws is None:
             kws = {}
-        self._after_abort.append((hook, tuple(args), kws))
+        with self._lock:
+            self._after_abort.add(hook, tuple(args), kws, order, key)
 
     def _callAfterAbortHooks(self):
-        self._call_hooks(self._after_abort, clean=True)
+        self._call_hooks(self._hooks('_after_abort'), clean=True)
 
     def _commitResources(self):
         # Execute the two-phase commit protocol.
-
-        L = list(self._resources)
-        L.sort(key=rm_key)
-        try:
-            for rm in L:
-                rm.tpc_begin(self)
-            for rm in L:
-                rm.commit(self)
-                self.log.debug("commit %r", rm)
-            for rm in L:
-                rm.tpc_vote(self)
-                self._voted[id(rm)] = True
-
-            try:
-                for rm in L:
-                    rm.tpc_finish(self)
-            except:  # noqa: E722 do not use bare 'except'
-                # TODO: do we need to make this warning stronger?
-                # TODO: It would be nice if the system could be configured
-                # to stop committing transactions at this point.
-                self.log.critical("A storage error occurred during the second "
-                                  "phase of the two-phase commit.  Resources "
-                                  "may be in an inconsistent state.")
-                raise
-        except:  # noqa: E722 do not use bare 'except'
-            # If an error occurs committing a transaction, we try
-            # to revert the changes in each of the resource managers.
-            t, v, tb = sys.exc_info()
-            try:
-                try:
-                    self._cleanup(L)
-                finally:
-                    self._synchronizers.map(lambda s: s.afterCompletion(self))
-                raise v.with_traceback(tb)
-            finally:
-                del t, v, tb
+        if self._resources:
+            _commitResources([self])
 
     def _cleanup(self, L):
         # Called when an exception occurs during tpc_vote or tpc_finish.
+        outcomes = self.outcomes = list(self.outcomes)
+        reached = {id(rm): outcome for rm, outcome in outcomes}
         for rm in L:
             if id(rm) not in self._voted:
                 try:
@@ -467,11 +701,18 @@ class Transaction:
                     self.log.error("Error in abort() on manager %s",
                                    rm, exc_info=sys.exc_info())
         for rm in L:
+            outcome = reached.get(id(rm))
+            if outcome is Outcome.FINISHED:
+                # Too late to abort that one; compensating is up to the
+                # application, see Transaction.outcomes.
+                continue
             try:
                 rm.tpc_abort(self)
             except Exception:
                 self.log.error("Error in tpc_abort() on manager %s",
                                rm, exc_info=sys.exc_info())
+            if outcome is None:
+                outcomes.append((rm, Outcome.ABORTED))
 
     def _free_manager(self):
         try:
@@ -491,17 +732,30 @@ class Transaction:
         # as the current transaction from its manager after this, and all
         # IDatamanager objects joined to it will forgotten
         # All hooks and data are forgotten.
-        self._free_manager()
+        if self._manager is not None:
+            self._free_manager()
+
+        if self._watchdog is not None:
+            self._watchdog.unwatch(self)
+            self._watchdog = None
+
+        attrs = self.__dict__
+        attrs.pop('_data', None)
+        self._cache = None
 
-        if hasattr(self, '_data'):
-            delattr(self, '_data')
+        if self._forks:
+            for context in self._forks:
+                context._close()
+            self._forks = ()
 
-        del self._resources[:]
+        if self._resources:
+            del self._resources[:]
+        self.outcomes = ()
 
-        del self._before_commit[:]
-        del self._after_commit[:]
-        del self._before_abort[:]
-        del self._after_abort[:]
+        for name in _HOOK_NAMES:
+            hooks = attrs.get(name)
+            if hooks:
+                hooks.clear()
 
         # self._synchronizers might be shared, we can't mutate it
         self._synchronizers = _NoSynchronizers
@@ -530,6 +784,12 @@ class Transaction:
 
     def abort(self):
         """See `~transaction.interfaces.ITransaction`."""
+        if self._forks:
+            self._waitForWorkers()
+        if not (self._resources or self._savepoint2index
+                or not self.__dict__.keys().isdisjoint(_HOOK_NAMES)):
+            self._abortUntouched()
+            return
         try:
             t = None
             v = None
@@ -564,7 +824,7 @@ class Transaction:
 
             self._synchronizers.map(lambda s: s.afterCompletion(self))
 
-            self.log.debug("abort")
+            self._debug("abort")
 
             if tb is not None:
                 raise v.with_traceback(tb)
@@ -572,14 +832,41 @@ class Transaction:
             self._free()
             del t, v, tb
 
+    def _abortUntouched(self):
+        # Aborting a transaction that nothing joined and that has no
+        # hooks or savepoints only has to notify the synchronizers,
+        # which is all most read-only requests need.
+        synchronizers = self._synchronizers
+        error = None
+        try:
+            try:
+                synchronizers.map(lambda s: s.beforeCompletion(self))
+            except:  # noqa: E722 do not use bare 'except'
+                error = sys.exc_info()[1]
+                self.log.error(
+                    "Failed to call synchronizers", exc_info=sys.exc_info())
+            self._free_manager()
+            synchronizers.map(lambda s: s.afterCompletion(self))
+            self._debug("abort")
+            if error is not None:
+                raise error
+        finally:
+            self._free()
+            del error
+
     def note(self, text):
         """See `~transaction.interfaces.ITransaction`."""
         if text is not None:
             text = text_or_warn(text).strip()
-            if self.description:
-                self.description += "\n" + text
-            else:
-                self.description = text
+            # Joining the notes when the description is read keeps
+            # noting many times linear.  The notes are only empty when
+            # the description is, which then is replaced, not extended.
+            notes = self._notes
+            if notes is None:
+                notes = self._notes = (
+                    [self._description] if self._description else [])
+            if notes or text:
+                notes.append(text)
 
     def setUser(self, user_name, path="/"):
         """See `~transaction.interfaces.ITransaction`."""
@@ -589,13 +876,123 @@ class Transaction:
         """See `~transaction.interfaces.ITransaction`."""
         self.extension[name] = value
 
+    def forkContext(self):
+        """See `~transaction.interfaces.ITransaction`."""
+        if self._lock is _noLock:
+            self._lock = threading.RLock()
+        context = ForkContext(self)
+        with self._lock:
+            self._forks = list(self._forks) + [context]
+        return context
+
+    def _waitForWorkers(self):
+        for context in self._forks:
+            context.wait()
+
     def isRetryableError(self, error):
         return self._manager._retryable(type(error), error)
 
+    def retryBlock(self, tries=3):
+        """See `~transaction.interfaces.ITransaction`."""
+        if tries <= 0:
+            raise ValueError("tries must be > 0")
+        for try_no in range(1, tries + 1):
+            attempt = _BlockAttempt(self, try_no < tries)
+            yield attempt
+            if attempt.success:
+                break
+
 
 # TODO: We need a better name for the adapters.
 
 
+def _commitResources(transactions):
+    # Execute the two-phase commit protocol over the data managers
+    # joined to all of *transactions*, in a single sortKey order.  Each
+    # data manager is called with the transaction it joined.
+    L = [(rm, txn) for txn in transactions for rm in txn._resources]
+    L.sort(key=lambda item: rm_key(item[0]))
+    coordinator_log = None
+    for txn in transactions:
+        txn.outcomes = []
+        if coordinator_log is None:
+            coordinator_log = getattr(txn._manager, 'coordinator_log', None)
+    decided = False
+    try:
+        for rm, txn in L:
+            rm.tpc_begin(txn)
+        for rm, txn in L:
+            rm.commit(txn)
+            txn.log.debug("commit %r", rm)
+        for rm, txn in L:
+            rm.tpc_vote(txn)
+            txn._voted[id(rm)] = True
+
+        if coordinator_log is not None:
+            # Everybody voted yes: make the decision durable before
+            # telling anybody, so that it can be recovered.
+            if len(transactions) > 1:
+                tid = coordinator_log.logCommit(
+                    transactions[0], [rm for rm, txn in L],
+                    [txn for rm, txn in L])
+            else:
+                tid = coordinator_log.logCommit(transactions[0],
+                                                [rm for rm, txn in L])
+            decided = True
+
+        error = None
+        for rm, txn in L:
+            try:
+                rm.tpc_finish(txn)
+            except:  # noqa: E722 do not use bare 'except'
+                txn.outcomes.append((rm, Outcome.FAILED))
+                # TODO: do we need to make this warning stronger?
+                # TODO: It would be nice if the system could be configured
+                # to stop committing transactions at this point.
+                txn.log.critical("A storage error occurred during the "
+                                 "second phase of the two-phase commit.  "
+                                 "Resources may be in an inconsistent "
+                                 "state.")
+                if not decided:
+                    raise
+                # The decision is logged: the others must still commit,
+                # and this one is left in doubt for recovery.
+                if error is None:
+                    error = sys.exc_info()[1]
+            else:
+                txn.outcomes.append((rm, Outcome.FINISHED))
+        if error is not None:
+            try:
+                raise error
+            finally:
+                del error
+    except:  # noqa: E722 do not use bare 'except'
+        # If an error occurs committing a transaction, we try
+        # to revert the changes in each of the resource managers,
+        # unless the decision to commit was logged.
+        t, v, tb = sys.exc_info()
+        try:
+            for txn in transactions:
+                try:
+                    if not decided:
+                        txn._cleanup(
+                            [rm for rm, joined in L if joined is txn])
+                finally:
+                    txn._synchronizers.map(
+                        lambda s, txn=txn: s.afterCompletion(txn))
+            raise v.with_traceback(tb)
+        finally:
+            del t, v, tb
+
+    if coordinator_log is not None:
+        try:
+            coordinator_log.logCommitted(tid)
+        except Exception:
+            # Not fatal: recovery would just finish it again.
+            transactions[0].log.error("Failed to log the end of the commit",
+                                      exc_info=sys.exc_info())
+
+
 def rm_key(rm):
     func = getattr(rm, 'sortKey', None)
     if func is not None:
@@ -667,6 +1064,144 @@ class NoRollbackSavepoint:
         raise TypeError("Savepoints unsupported", self.datamanager)
 
 
+class _BlockAttempt:
+    # An attempt of Transaction.retryBlock.
+
+    success = False
+
+    def __init__(self, transaction, retry):
+        self.transaction = transaction
+        self.retry = retry
+        self._savepoint = None
+
+    def __enter__(self):
+        self._savepoint = self.transaction.savepoint()
+        return self.transaction
+
+    def __exit__(self, t, v, tb):
+        if v is None:
+            self.success = True
+        elif (self.retry and isinstance(v, Exception)
+                and self.transaction.isRetryableError(v)):
+            self._savepoint.rollback()
+            return True  # try again
+
+
+class ForkContext:
+    """Lets worker threads work in a transaction of another thread.
+
+    Created by `Transaction.forkContext`.  Code running in the context
+    (see `submit`, or use the context as a context manager in a worker
+    thread) sees the transaction as the current transaction of the
+    thread-local ``transaction.manager``, so data managers join it,
+    and can register hooks in it.
+
+    Committing or aborting the transaction waits for the work running
+    in the context to finish.  If some of it fails, the transaction is
+    doomed.  Work in the context must not commit, abort or take
+    savepoints of the transaction itself.
+    """
+
+    def __init__(self, transaction):
+        self.transaction = transaction
+        self._cond = threading.Condition()
+        # Submitted calls that haven't finished, and active contexts.
+        self._pending = 0
+        # thread id -> number of contexts it entered.
+        self._workers = {}
+        # The current transactions the contexts replaced, per thread.
+        self._local = threading.local()
+        self._closed = False
+
+    def _start(self):
+        with self._cond:
+            if self._closed:
+                raise ValueError("The transaction is already complete")
+            self._pending += 1
+
+    def _finish(self):
+        with self._cond:
+            self._pending -= 1
+            self._cond.notify_all()
+
+    def __enter__(self):
+        self._start()
+        ident = threading.get_ident()
+        with self._cond:
+            self._workers[ident] = self._workers.get(ident, 0) + 1
+        import transaction
+        manager = transaction.manager.manager
+        with manager._lock:
+            previous = manager._txn
+            manager._txn = self.transaction
+        stack = getattr(self._local, 'previous', None)
+        if stack is None:
+            stack = self._local.previous = []
+        stack.append(previous)
+        return self.transaction
+
+    def __exit__(self, t, v, tb):
+        import transaction
+        manager = transaction.manager.manager
+        with manager._lock:
+            manager._txn = self._local.previous.pop()
+        ident = threading.get_ident()
+        with self._cond:
+            if v is not None and not self.transaction.isDoomed():
+                try:
+                    self.transaction.doom()
+                except ValueError:
+                    pass  # it failed anyway
+            count = self._workers[ident] - 1
+            if count:
+                self._workers[ident] = count
+            else:
+                del self._workers[ident]
+        self._finish()
+
+    def submit(self, executor, func, *args, **kw):
+        """Call ``func(*args, **kw)`` in this context in a worker of
+        *executor* (a thread pool), returning the
+        `concurrent.futures.Future` of the result.
+
+        The transaction waits for the call from now on (unless the
+        future is cancelled).
+        """
+        self._start()
+        try:
+            future = executor.submit(self._call, func, args, kw)
+        except:  # noqa: E722 do not use bare 'except'
+            self._finish()
+            raise
+        future.add_done_callback(self._cancelled)
+        return future
+
+    def _call(self, func, args, kw):
+        try:
+            with self:
+                return func(*args, **kw)
+        finally:
+            self._finish()
+
+    def _cancelled(self, future):
+        if future.cancelled():
+            self._finish()
+
+    def wait(self, timeout=None):
+        """Wait for the work in this context to finish.
+
+        Return false if it didn't within *timeout* seconds.
+        """
+        with self._cond:
+            if threading.get_ident() in self._workers:
+                raise ValueError("Can't wait for workers in a worker")
+            return self._cond.wait_for(lambda: not self._pending, timeout)
+
+    def _close(self):
+        with self._cond:
+            self._closed = True
+
+
 def text_or_warn(s):
     if isinstance(s, str):
         return s
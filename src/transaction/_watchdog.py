@@ -0,0 +1,190 @@
+############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+"""Reporting (and dooming) transactions that stay open too long.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+from transaction import _transaction
+from transaction._transaction import Status
+
+
+logger = logging.getLogger(__name__)
+
+
+class Watchdog:
+    """Watch for transactions that stay open for too long.
+
+    Once started, the watchdog keeps track of all transactions created
+    by any transaction manager, until they are committed or aborted.
+    Every *interval* seconds (by default, *threshold*), a background
+    thread `checks <check>` for transactions older than *threshold*
+    seconds and logs a warning for each of them, including the stack
+    where it was begun (unless *stacks* is false).
+
+    If *doom* is true, these transactions are also `doomed
+    <transaction.interfaces.ITransaction.doom>`, so they can't commit
+    and the request holding them fails instead of degrading
+    everybody else's throughput.  Transactions that started committing
+    are only reported: the watchdog and the committing thread agree on
+    which comes first, so a transaction is either doomed before it is
+    checked for commit, or never.
+
+    Only transactions created while the watchdog runs are watched.
+    """
+
+    def __init__(self, threshold, interval=None, doom=False, stacks=True):
+        self.threshold = threshold
+        self.interval = threshold if interval is None else interval
+        self.doom = doom
+        self.stacks = stacks
+        self._lock = threading.Lock()
+        # id(txn) -> (weakref to txn, start time, stack).  Transactions
+        # that are simply dropped (never committed or aborted) are
+        # forgotten when checking.
+        self._active = {}
+        # ids of the watched transactions that started committing.
+        self._committing = set()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start watching new transactions and checking periodically."""
+        _transaction._WATCHDOG = self
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='transaction-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching."""
+        if _transaction._WATCHDOG is self:
+            _transaction._WATCHDOG = None
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._active.clear()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception:  # pragma: no cover
+                logger.exception("Failed to check for old transactions")
+
+    def watch(self, txn):
+        """Start watching *txn*.
+
+        Transactions call this when created while the watchdog runs.
+        """
+        stack = None
+        if self.stacks:
+            # Only keep the code locations, skipping this method and
+            # Transaction.__init__: source lines are looked up only for
+            # the transactions reported by check().
+            stack = []
+            frame = sys._getframe(2)
+            while frame is not None:
+                stack.append((frame.f_code, frame.f_lineno))
+                frame = frame.f_back
+        with self._lock:
+            self._active[id(txn)] = (weakref.ref(txn), time.monotonic(),
+                                     stack)
+
+    def unwatch(self, txn):
+        """Stop watching *txn*.
+
+        Transactions call this when they are committed or aborted.
+        """
+        with self._lock:
+            self._active.pop(id(txn), None)
+            self._committing.discard(id(txn))
+
+    def committing(self, txn):
+        """Never doom *txn* from now on.
+
+        Transactions call this when they start committing, before
+        checking whether they are doomed.
+        """
+        with self._lock:
+            if id(txn) in self._active:
+                self._committing.add(id(txn))
+
+    def check(self):
+        """Report (and maybe doom) the transactions open for too long.
+
+        Return a list of ``(transaction, age, stack)`` triples, where
+        *age* is in seconds and *stack* is a `traceback.StackSummary`
+        of the place the transaction was begun (or None).
+        """
+        now = time.monotonic()
+        old = []
+        with self._lock:
+            active = self._active
+            for key, (ref, start, stack) in list(active.items()):
+                txn = ref()
+                if txn is None:
+                    del active[key]
+                    self._committing.discard(key)
+                elif now - start >= self.threshold:
+                    old.append((txn, now - start, stack))
+                    # Dooming while holding the lock can't race with
+                    # the transaction starting to commit.
+                    if (self.doom and key not in self._committing
+                            and txn.status is Status.ACTIVE):
+                        try:
+                            txn.doom()
+                        except ValueError:
+                            # Its status changed in the meantime.
+                            pass
+        old = [(txn, age, _summarize(stack)) for txn, age, stack in old]
+        for txn, age, stack in old:
+            where = ''.join(stack.format()) if stack else ''
+            logger.warning("Transaction %s open for %.1f seconds\n%s",
+                           txn.id, age, where)
+        return old
+
+
+def _forgetWatchdog():
+    # Called in child processes after forking: the watchdog thread
+    # doesn't exist there, and may have held the lock when the process
+    # forked.  The transactions being watched belong to the parent.
+    watchdog = _transaction._WATCHDOG
+    if watchdog is not None:
+        _transaction._WATCHDOG = None
+        watchdog._lock = threading.Lock()
+        watchdog._active.clear()
+        watchdog._committing.clear()
+        watchdog._thread = None
+
+
+if hasattr(os, 'register_at_fork'):  # pragma: no branch
+    os.register_at_fork(after_in_child=_forgetWatchdog)
+
+
+def _summarize(stack):
+    # Turn the code locations kept by Watchdog.watch (innermost first)
+    # into a StackSummary.
+    if stack is None:
+        return None
+    return traceback.StackSummary.from_list(
+        [(code.co_filename, lineno, code.co_name, None)
+         for code, lineno in reversed(stack)])
@@ -176,10 +176,91 @@ class ITransactionManager(Interface):
         calling ``run(func, tries)``.
         """
 
+    def arun(func, tries=3, backoff=0):
+        """Await *func()* in its own transaction, like `run`.
+
+        *func* is a coroutine function; ``arun`` is one too.  The
+        call is retried like with `run`, waiting (without blocking
+        the event loop) *backoff* seconds before the second try,
+        and twice as long before each further one.
+
+        The transaction is the manager's current one, so tasks running
+        concurrently in an event loop must use separate managers
+        (a thread-local manager is shared by all tasks of its thread).
+        """
+
+    def aattempts(number=3, backoff=0):
+        """Asynchronously generate up to *number* (transactional)
+        context managers, like `attempts`.
+
+        This method is typically used in coroutines as follows::
+
+            async for attempt in transaction_manager.aattempts():
+                with attempt:
+                    *with block*
+
+        The *with block* may ``await``.  Retries wait like with `arun`.
+        """
+
+    def submit(executor, func, *args, tries=3, **kw):
+        """Call ``func(*args, **kw)`` in a transaction in a worker of
+        *executor*, retrying like `run`.
+
+        *executor* is a `concurrent.futures.Executor`, usually a
+        ``ThreadPoolExecutor`` or a ``ProcessPoolExecutor``; its
+        workers must not be the calling thread.  Return the
+        `concurrent.futures.Future` of the result.
+
+        In the worker, the call is run with the thread-local
+        ``transaction.manager``, in transactions with the ``user``,
+        ``description`` and ``extension`` of this manager's current
+        transaction, if any.  For a process pool, *func*, its arguments
+        and result, and the extension must be picklable.
+        """
+
+    def chunked(iterable, func, size=100, tries=3, savepoint=None,
+                latency=None):
+        """Call *func(item)* for the items of *iterable*, in batches,
+        each in its own transaction.
+
+        This is a generator: the items of each batch of up to *size*
+        items are processed and committed with `run` (so a batch is
+        retried up to *tries* times in case of some kind of
+        `retriable error <ITransaction.isRetryableError>`), then the
+        list of the results of *func* for that batch is generated.
+        Only a batch of items is kept in memory at a time.
+
+        If *savepoint* is given, an (optimistic) savepoint is taken
+        every *savepoint* items, allowing data managers to move
+        changes out of memory within a batch.
+
+        If *latency* is given, the batch size is adapted after each
+        batch, so that committing a batch takes about *latency*
+        seconds.
+
+        *size* may also be a `~transaction.BatchSizer`, which then
+        recommends the size of each batch, and is told about the
+        commit durations and the retriable errors of the batches.
+
+        .. versionadded:: 5.2
+        """
+
 
 class ITransaction(Interface):
     """Object representing a running transaction."""
 
+    id = Attribute(
+        """A text (unicode) identifier of the transaction.
+
+        Ids are assigned when transactions are created.  They are
+        unique across the processes of a host, and, as they start
+        with the creation time, sorting them sorts transactions by
+        creation time.  They are meant to correlate a transaction
+        across logs, metrics and the systems it commits to.
+
+        .. versionadded:: 5.2
+        """)
+
     user = Attribute(
         """A user name associated with the transaction.
 
@@ -207,6 +288,43 @@ class ITransaction(Interface):
     extension = Attribute(
         "A dictionary containing application-defined metadata.")
 
+    cache = Attribute(
+        """A mapping memoizing values for the lifetime of the transaction.
+
+        Applications can cache values computed from transactional
+        state, e.g. the results of permission checks or queries, under
+        keys of their choosing.  The cache is emptied when a savepoint
+        is rolled back and dropped when the transaction ends, so
+        nothing leaks into the next attempt of a retried transaction.
+        See `transaction.TransactionCache` and `transaction.cached`.
+        """)
+
+    outcomes = Attribute(
+        """The outcome of each data manager of the last commit attempt.
+
+        A sequence of ``(datamanager, outcome)`` pairs, in the order the
+        outcomes were reached, where *outcome* is one of the constants
+        of `transaction.Outcome`: ``FINISHED`` (``tpc_finish``
+        succeeded), ``FAILED`` (``tpc_finish`` raised an exception) or
+        ``ABORTED`` (the data manager was aborted instead).
+
+        When ``tpc_finish`` fails for some data manager after others
+        finished, the finished ones are not aborted (it's too late for
+        that).  If the transaction manager has a
+        `~transaction.CoordinatorLog`, no data manager is aborted once the
+        decision to commit is logged: ``tpc_finish`` is still called on
+        all of them, and those that failed are left in doubt, for
+        `~transaction.CoordinatorLog.recover`.
+
+        The outcomes let synchronizers (in ``afterCompletion``) and
+        after-commit hooks (called with a false status) take
+        compensating actions for exactly the data managers that need
+        them.  The sequence is empty before a commit and after the
+        transaction was freed.
+
+        .. versionadded:: 5.2
+        """)
+
     def commit():
         """Finalize the transaction.
 
@@ -278,7 +396,7 @@ class ITransaction(Interface):
         raise an exception, or remove `<name, value>` pairs).
         """
 
-    def addBeforeCommitHook(hook, args=(), kws=None):
+    def addBeforeCommitHook(hook, args=(), kws=None, order=0, key=None):
         """Register a hook to call before the transaction is committed.
 
         The specified hook function will be called after the
@@ -291,13 +409,26 @@ class ITransaction(Interface):
         :param dict kws:
             Keyword arguments to pass to the hook. The default
             is to pass no keyword arguments.
-
-        Multiple hooks can be registered and will be called in the
-        order they were registered (first registered, first called).
-        This method can also be called from a hook: an executing hook
-        can register more hooks. Applications should take care to
-        avoid creating infinite loops by recursively registering
-        hooks.
+        :param int order:
+            Hooks with a lower *order* are called before hooks with
+            a higher one. The default is 0. Registering cheap
+            validation hooks that may fail with a negative *order*
+            lets them run before expensive hooks.
+        :param key:
+            If given (any hashable), registrations are coalesced by
+            *key*: registering a hook with the *key* of a hook that
+            hasn't been called yet replaces that registration's hook,
+            *args* and *kws* (last registration wins) while keeping
+            its place.  This makes it cheap to register a hook like
+            "flush the index" once per modified object.
+
+        Multiple hooks can be registered and, for equal *order*, will
+        be called in the order they were registered (first registered,
+        first called).  This method can also be called from a hook: an
+        executing hook can register more hooks; they are called after
+        the executing hook, even if their *order* is lower.
+        Applications should take care to avoid creating infinite loops
+        by recursively registering hooks.
 
         Hooks are called only for a top-level commit. A savepoint
         creation does not call any hooks. If the transaction is
@@ -309,6 +440,9 @@ class ITransaction(Interface):
         every transaction; in such a case consider registering a
         synchronizer object via `ITransactionManager.registerSynch`
         instead.
+
+        .. versionchanged:: 5.2
+           Add the *order* and *key* arguments.
         """
 
     def getBeforeCommitHooks():
@@ -319,7 +453,25 @@ class ITransaction(Interface):
         by a top-level transaction commit.
         """
 
-    def addAfterCommitHook(hook, args=(), kws=None):
+    def getBeforeCommitBatch(hook, key=None, order=0):
+        """Return the list of items to call *hook* with before commit.
+
+        The first call for a *key* (which defaults to *hook* itself)
+        registers a before-commit hook (see `addBeforeCommitHook`,
+        which also describes *order*) and returns a new, empty list.
+        Later calls with the same *key* return the same list, so
+        callers simply append items to it.  At commit time *hook* is
+        called once, with the list as its only argument.
+
+        This turns one hook call (e.g. one indexing request) per
+        modified object into a single call for all of them.  Items
+        added after *hook* has been called go into a new batch, which
+        is passed to another call of *hook*.
+
+        .. versionadded:: 5.2
+        """
+
+    def addAfterCommitHook(hook, args=(), kws=None, order=0, key=None):
         """Register a hook to call after a transaction commit attempt.
 
         The specified hook function will be called after the
@@ -328,7 +480,7 @@ class ITransaction(Interface):
         succeeded, or `False` if the commit aborted.
         *args* and *kws* are interpreted as for `addBeforeCommitHook`
         (with the exception that there is always one positional
-        argument, the commit status).
+        argument, the commit status), and *order* and *key* as well.
         As with `addBeforeCommitHook`, multiple hooks can be
         registered, savepoint creation doesn't call any hooks, and
         calling a hook consumes its registration.
@@ -343,14 +495,15 @@ class ITransaction(Interface):
         transaction commit.
         """
 
-    def addBeforeAbortHook(hook, args=(), kws=None):
+    def addBeforeAbortHook(hook, args=(), kws=None, order=0, key=None):
         """Register a hook to call before the transaction is aborted.
 
         The specified hook function will be called after the
         transaction's abort method has been called, but before the
         abort process has been started.
 
-        *args* and *kws* are interpreted as for `addBeforeCommitHook`.
+        *args*, *kws*, *order* and *key* are interpreted as for
+        `addBeforeCommitHook`.
         As with `addBeforeCommitHook`, multiple hooks can be
         registered, savepoint creation doesn't call any hooks, and
         calling a hook consumes its registration.
@@ -371,13 +524,14 @@ class ITransaction(Interface):
         transaction abort.
         """
 
-    def addAfterAbortHook(hook, args=(), kws=None):
+    def addAfterAbortHook(hook, args=(), kws=None, order=0, key=None):
         """Register a hook to call after a transaction abort.
 
         The specified hook function will be called after the
         transaction abort.
 
-        *args* and *kws* are interpreted as for `addBeforeCommitHook`.
+        *args*, *kws*, *order* and *key* are interpreted as for
+        `addBeforeCommitHook`.
         As with `addBeforeCommitHook`, multiple hooks can be
         registered, savepoint creation doesn't call any hooks, and
         calling a hook consumes its registration.
@@ -424,6 +578,51 @@ class ITransaction(Interface):
         issues in the underlying storage engine.
         """
 
+    def forkContext():
+        """Return a `transaction.ForkContext` letting other threads work
+        in this transaction.
+
+        Typically, work is fanned out to a thread pool::
+
+            context = transaction.forkContext()
+            for item in items:
+                context.submit(executor, process, item)
+            transaction.commit()
+
+        The data managers used by the workers join this transaction,
+        and the workers can register hooks; this transaction's
+        `join` and hook registration methods become thread-safe.
+        Committing or aborting this transaction waits for the
+        workers to finish; if some of them fail, this transaction is
+        doomed.
+        """
+
+    def retryBlock(tries=3):
+        """Generate up to *tries* context managers retrying a block of
+        code within this transaction.
+
+        This method is typically used as follows::
+
+            for attempt in transaction.retryBlock():
+                with attempt:
+                    *with block*
+
+        Unlike `ITransactionManager.attempts`, which retries whole
+        transactions, ``with attempt:`` takes a `savepoint` of this
+        transaction and runs the *with block*.  If that raises a
+        `retryable error <isRetryableError>` and the maximal number of
+        attempts is not yet reached, the savepoint is rolled back and
+        the next iteration runs the block again, keeping the work done
+        before.  In all other cases, the ``for`` loop terminates, with
+        the exception if there was one; the transaction is neither
+        committed nor aborted.
+
+        This only helps with errors that retrying within the same
+        transaction can overcome, e.g. a lock held by a concurrent
+        transaction in some external resource; all data managers joined
+        must support savepoints.
+        """
+
 
 class IDataManager(Interface):
     """Objects that manage transactional storage.
@@ -559,6 +758,69 @@ class IRetryDataManager(IDataManager):
         """
 
 
+class IRecoverableDataManager(IDataManager):
+
+    def recover(transaction_id):
+        """Finish committing a transaction that was left in doubt.
+
+        This is called by `transaction.CoordinatorLog.recover` for a
+        transaction this data manager voted to commit, but which may
+        not have been finished (because the process died, or because
+        another data manager's ``tpc_finish`` failed first).
+        *transaction_id* is the transaction's `~ITransaction.id`;
+        data managers must persist what they need to finish the commit
+        under that id when they vote.
+
+        This must be idempotent: it's also called for transactions
+        that this data manager already finished.
+        """
+
+
+class IOutboxStore(Interface):
+    """Durable storage of the messages of a `transaction.Outbox`.
+
+    Messages are staged by transaction (identified by its
+    `~ITransaction.id`) when it votes, and become deliverable once it
+    is committed.
+
+    .. versionadded:: 5.2
+    """
+
+    def stage(transaction_id, messages):
+        """Durably store *messages* sent in a transaction.
+
+        *messages* is a sequence of ``(destination, payload)`` pairs,
+        where *destination* is text and *payload* bytes.
+        """
+
+    def commit(transaction_id):
+        """Make the messages staged by a transaction deliverable.
+
+        This must be idempotent.
+        """
+
+    def discard(transaction_id):
+        """Forget the messages staged by a transaction.
+        """
+
+    def pending(limit):
+        """Return up to *limit* deliverable messages, oldest first.
+
+        The result is a sequence of ``(id, destination, payload)``
+        triples; *id* identifies the message for `delivered`.
+        """
+
+    def delivered(ids):
+        """Forget delivered messages, given their ids."""
+
+    def inDoubt():
+        """Return the ids of transactions whose messages are staged but
+        not committed."""
+
+    def close():
+        """Release the resources used by the store."""
+
+
 class IDataManagerSavepoint(Interface):
     """Savepoint for data-manager changes for use in transaction savepoints.
 
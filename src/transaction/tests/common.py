@@ -40,6 +40,9 @@ class DummyLogger:
     def debug(self, msg, *args, **kw):
         self.log('debug', msg, *args, **kw)
 
+    def warning(self, msg, *args, **kw):
+        self.log('warning', msg, *args, **kw)
+
     def error(self, msg, *args, **kw):
         self.log('error', msg, *args, **kw)
 
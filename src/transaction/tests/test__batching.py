@@ -0,0 +1,106 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE
+#
+##############################################################################
+import unittest
+
+
+class BatchSizerTests(unittest.TestCase):
+
+    def _getTargetClass(self):
+        from transaction import BatchSizer
+        return BatchSizer
+
+    def _makeOne(self, *args, **kw):
+        return self._getTargetClass()(*args, **kw)
+
+    def test_ctor_defaults(self):
+        sizer = self._makeOne()
+        self.assertEqual(sizer.size, 100)
+        self.assertEqual(sizer.increase, 10)
+        self.assertEqual(sizer.commits, 0)
+        self.assertEqual(sizer.conflicts, 0)
+        self.assertIsNone(sizer.commit_time)
+        self.assertEqual(sizer.conflict_rate, 0.0)
+        self.assertEqual(self._makeOne(5).increase, 1)
+
+    def test_ctor_w_invalid_arguments(self):
+        self.assertRaises(ValueError, self._makeOne, 0, minimum=0)
+        self.assertRaises(ValueError, self._makeOne, 5, minimum=10)
+        self.assertRaises(ValueError, self._makeOne, 50, maximum=10)
+        self.assertRaises(ValueError, self._makeOne, decrease=1)
+
+    def test_committed_increases_additively(self):
+        sizer = self._makeOne(10, maximum=14, increase=3)
+        sizer.committed(0.5)
+        self.assertEqual(sizer.size, 13)
+        self.assertEqual(sizer.commit_time, 0.5)
+        sizer.committed(1.5)
+        self.assertEqual(sizer.size, 14)
+        self.assertAlmostEqual(sizer.commit_time, 0.6)
+        self.assertEqual(sizer.commits, 2)
+
+    def test_conflicted_decreases_multiplicatively(self):
+        sizer = self._makeOne(100, minimum=20)
+        sizer.conflicted()
+        self.assertEqual(sizer.size, 50)
+        self.assertAlmostEqual(sizer.conflict_rate, 0.1)
+        sizer.conflicted()
+        sizer.conflicted()
+        self.assertEqual(sizer.size, 20)
+        self.assertEqual(sizer.conflicts, 3)
+        sizer.committed(0)
+        self.assertAlmostEqual(sizer.conflict_rate, 0.2439)
+
+    def test_slow_commit_decreases(self):
+        sizer = self._makeOne(100, latency=1)
+        sizer.committed(1)
+        self.assertEqual(sizer.size, 110)
+        sizer.committed(2)
+        self.assertEqual(sizer.size, 55)
+
+    def test_throughput_vs_fixed_sizes(self):
+        # Simulate a job where each commit costs a round-trip worth 10
+        # items, and each item has a 0.2% chance of conflicting with
+        # concurrent jobs, which costs a retry of its batch.
+        throughputs = {size: _simulate(size) for size in (1, 10, 100, 1000)}
+        best = max(throughputs.values())
+        adaptive = _simulate(self._makeOne(10))
+        # Better than too small or too large fixed sizes ...
+        self.assertGreater(adaptive, 1.4 * throughputs[10])
+        self.assertGreater(adaptive, 5 * throughputs[1000])
+        # ... and close to the best one, without having to find it.
+        self.assertGreater(adaptive, 0.9 * best)
+        adaptive = _simulate(self._makeOne(1000, increase=5))
+        self.assertGreater(adaptive, 0.9 * best)
+
+
+def _simulate(sizer, items=100000, round_trip=10, conflicts=0.002):
+    # Return the simulated number of items committed per time unit,
+    # for a fixed batch size or a BatchSizer.
+    import random
+    rng = random.Random(42)
+    fixed = isinstance(sizer, int)
+    clock = committed = 0
+    while committed < items:
+        size = min(sizer if fixed else sizer.size, items - committed)
+        while True:
+            clock += round_trip + size
+            if rng.random() >= (1 - conflicts) ** size:
+                if not fixed:
+                    sizer.conflicted()
+                continue
+            break
+        if not fixed:
+            sizer.committed(round_trip)
+        committed += size
+    return items / clock
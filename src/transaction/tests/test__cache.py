@@ -0,0 +1,156 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE
+#
+##############################################################################
+import unittest
+
+
+class TransactionCacheTests(unittest.TestCase):
+
+    def _getTargetClass(self):
+        from transaction import TransactionCache
+        return TransactionCache
+
+    def _makeOne(self, maxsize=None):
+        return self._getTargetClass()(maxsize)
+
+    def test_mapping(self):
+        cache = self._makeOne()
+        cache['a'] = 1
+        cache[('b', 2)] = 2
+        self.assertEqual(len(cache), 2)
+        self.assertIn('a', cache)
+        self.assertEqual(cache.get('c'), None)
+        del cache['a']
+        self.assertEqual(dict(cache), {('b', 2): 2})
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_compute(self):
+        calls = []
+
+        def func(*args, **kw):
+            calls.append((args, kw))
+            return len(calls)
+        cache = self._makeOne()
+        self.assertEqual(cache.compute('k', func, 1, a=2), 1)
+        self.assertEqual(cache.compute('k', func, 1, a=2), 1)
+        self.assertEqual(calls, [((1,), {'a': 2})])
+        # None is a value like any other.
+        self.assertIsNone(cache.compute('n', lambda: None))
+        self.assertIsNone(cache.compute('n', func))
+        self.assertEqual(len(calls), 1)
+
+    def test_maxsize_evicts_least_recently_used(self):
+        cache = self._makeOne(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        cache['a']
+        cache['c'] = 3
+        self.assertEqual(sorted(cache), ['a', 'c'])
+        cache['a'] = 10
+        cache['d'] = 4
+        self.assertEqual(sorted(cache), ['a', 'd'])
+
+    def test_maxsize_zero_keeps_nothing(self):
+        cache = self._makeOne(0)
+        self.assertEqual(cache.compute('a', lambda: 1), 1)
+        self.assertEqual(len(cache), 0)
+
+
+class TransactionCacheIntegrationTests(unittest.TestCase):
+
+    def _makeManager(self):
+        from transaction import TransactionManager
+        return TransactionManager()
+
+    def test_cache_is_lazy_and_per_transaction(self):
+        from transaction import TransactionCache
+        tm = self._makeManager()
+        txn = tm.begin()
+        self.assertIsNone(txn._cache)
+        self.assertIsInstance(txn.cache, TransactionCache)
+        self.assertIs(txn.cache, txn.cache)
+        self.assertIsNone(txn.cache.maxsize)
+        txn.cache['a'] = 1
+        tm.commit()
+        self.assertIsNone(txn._cache)
+        self.assertNotIn('a', tm.get().cache)
+
+    def test_cache_dropped_on_abort(self):
+        tm = self._makeManager()
+        txn = tm.begin()
+        txn.cache['a'] = 1
+        tm.abort()
+        self.assertIsNone(txn._cache)
+
+    def test_cache_size(self):
+        tm = self._makeManager()
+        tm.cache_size = 10
+        self.assertEqual(tm.get().cache.maxsize, 10)
+
+    def test_cache_size_thread_local_manager(self):
+        from transaction import ThreadTransactionManager
+        tm = ThreadTransactionManager()
+        tm.cache_size = 5
+        self.assertEqual(tm.manager.cache_size, 5)
+        self.assertEqual(tm.cache_size, 5)
+        self.assertEqual(tm.get().cache.maxsize, 5)
+
+    def test_cache_emptied_on_savepoint_rollback(self):
+        tm = self._makeManager()
+        txn = tm.get()
+        txn.cache['a'] = 1
+        sp = txn.savepoint()
+        txn.cache['b'] = 2
+        sp.rollback()
+        self.assertEqual(len(txn.cache), 0)
+        # Rolling back without a cache doesn't create one.
+        txn._cache = None
+        sp.rollback()
+        self.assertIsNone(txn._cache)
+
+    def test_cached(self):
+        from transaction import cached
+        tm = self._makeManager()
+        calls = []
+
+        @cached(transaction_manager=tm)
+        def lookup(a, b=0):
+            """Look up."""
+            calls.append((a, b))
+            return a + b
+        self.assertEqual(lookup.__doc__, "Look up.")
+        self.assertEqual(lookup(1), 1)
+        self.assertEqual(lookup(1), 1)
+        self.assertEqual(lookup(1, b=2), 3)
+        self.assertEqual(lookup(1, b=2), 3)
+        self.assertEqual(calls, [(1, 0), (1, 2)])
+        tm.abort()
+        self.assertEqual(lookup(1), 1)
+        self.assertEqual(len(calls), 3)
+
+    def test_cached_default_manager(self):
+        import transaction
+        calls = []
+
+        @transaction.cached
+        def lookup(a):
+            calls.append(a)
+            return a
+        try:
+            lookup(1)
+            lookup(1)
+            self.assertEqual(calls, [1])
+            self.assertEqual(len(transaction.get().cache), 1)
+        finally:
+            transaction.abort()
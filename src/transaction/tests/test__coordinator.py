@@ -0,0 +1,254 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE
+#
+##############################################################################
+import unittest
+
+
+class CoordinatorTests(unittest.TestCase):
+
+    def _getTargetClass(self):
+        from transaction import Coordinator
+        return Coordinator
+
+    def _makeOne(self, managers=None):
+        from transaction import TransactionManager
+        if managers is None:
+            managers = [TransactionManager(), TransactionManager()]
+        return self._getTargetClass()(managers)
+
+    def test_register_unregister(self):
+        from transaction import TransactionManager
+        tm1 = TransactionManager()
+        tm2 = TransactionManager()
+        coordinator = self._makeOne([tm1, tm1])
+        self.assertEqual(coordinator.managers, (tm1,))
+        coordinator.register(tm2)
+        coordinator.register(tm1)
+        self.assertEqual(coordinator.managers, (tm1, tm2))
+        self.assertEqual(coordinator.get(), [tm1.get(), tm2.get()])
+        coordinator.unregister(tm1)
+        self.assertEqual(coordinator.managers, (tm2,))
+        self.assertRaises(ValueError, coordinator.unregister, tm1)
+
+    def test_commit_wo_managers(self):
+        self._makeOne([]).commit()
+
+    def test_commit_single_2pc_in_shared_order(self):
+        from transaction._transaction import Status
+        calls = []
+        coordinator = self._makeOne()
+        txn1, txn2 = coordinator.begin()
+        dms = {key: DM(key, calls)
+               for key in ('d', 'b', 'c', 'a')}
+        txn1.join(dms['d'])
+        txn1.join(dms['b'])
+        txn2.join(dms['c'])
+        txn2.join(dms['a'])
+        coordinator.commit()
+        owner = {'a': txn2, 'b': txn1, 'c': txn2, 'd': txn1}
+        expected = [(method, key) for method in
+                    ('tpc_begin', 'commit', 'tpc_vote', 'tpc_finish')
+                    for key in 'abcd']
+        self.assertEqual([(method, key) for method, key, txn in calls],
+                         expected)
+        for method, key, txn in calls:
+            self.assertIs(txn, owner[key])
+        self.assertIs(txn1.status, Status.COMMITTED)
+        self.assertIs(txn2.status, Status.COMMITTED)
+        # Each transaction kept its own id.
+        self.assertEqual([txn.id for method, key, txn in calls],
+                         [owner[key].id for method, key, txn in calls])
+        self.assertNotEqual(txn1.id, txn2.id)
+        # Both transactions were freed.
+        self.assertIsNot(coordinator.get()[0], txn1)
+        self.assertIsNot(coordinator.get()[1], txn2)
+
+    def test_commit_calls_hooks_and_synchronizers_of_all(self):
+        from transaction import TransactionManager
+        tms = [TransactionManager(), TransactionManager()]
+        synchs = [Synch(), Synch()]
+        for tm, synch in zip(tms, synchs):
+            tm.registerSynch(synch)
+        coordinator = self._makeOne(tms)
+        txns = coordinator.begin()
+        called = []
+        for i, txn in enumerate(txns):
+            txn.addBeforeCommitHook(called.append, ('before%d' % i,))
+            txn.addAfterCommitHook(
+                lambda status, i=i: called.append(('after%d' % i, status)))
+        coordinator.commit()
+        self.assertEqual(called, ['before0', 'before1',
+                                  ('after0', True), ('after1', True)])
+        for synch, txn in zip(synchs, txns):
+            self.assertEqual(synch.before, [txn])
+            self.assertEqual(synch.after, [txn])
+
+    def test_commit_vote_failure_aborts_all(self):
+        from transaction._transaction import Status
+        from transaction.interfaces import TransactionFailedError
+        calls = []
+        coordinator = self._makeOne()
+        txn1, txn2 = coordinator.begin()
+        txn1.join(DM('a', calls))
+        txn2.join(DM('b', calls, fail='tpc_vote'))
+        called = []
+        txn1.addAfterCommitHook(called.append)
+        self.assertRaises(ValueError, coordinator.commit)
+        self.assertEqual(called, [False])
+        self.assertNotIn('tpc_finish', [method for method, _, _ in calls])
+        aborted = [key for method, key, _ in calls if method == 'tpc_abort']
+        self.assertEqual(aborted, ['a', 'b'])
+        self.assertIs(txn1.status, Status.COMMITFAILED)
+        self.assertIs(txn2.status, Status.COMMITFAILED)
+        self.assertRaises(TransactionFailedError, coordinator.commit)
+        coordinator.abort()
+        self.assertIsNot(coordinator.get()[0], txn1)
+
+    def test_commit_doomed_commits_nothing(self):
+        from transaction.interfaces import DoomedTransaction
+        calls = []
+        coordinator = self._makeOne()
+        txn1, txn2 = coordinator.begin()
+        txn1.join(DM('a', calls))
+        txn2.join(DM('b', calls))
+        txn2.doom()
+        self.assertRaises(DoomedTransaction, coordinator.commit)
+        self.assertEqual(calls, [])
+        coordinator.abort()
+        self.assertEqual([method for method, _, _ in calls],
+                         ['abort', 'abort'])
+
+    def test_commit_logs_one_decision(self):
+        import os
+        import shutil
+        import tempfile
+
+        from transaction import CoordinatorLog
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        log = CoordinatorLog(os.path.join(tmpdir, 'coordinator.log'))
+        self.addCleanup(log.close)
+        coordinator = self._makeOne()
+        coordinator.managers[1].coordinator_log = log
+        txn1, txn2 = coordinator.begin()
+        txn1.join(DM('b', []))
+        txn2.join(DM('a', [], fail='tpc_finish'))
+        self.assertRaises(ValueError, coordinator.commit)
+        self.assertEqual(log.inDoubt(), {txn1.id: ['a', 'b']})
+
+    def test_recover_w_ids_of_joined_transactions(self):
+        import os
+        import shutil
+        import tempfile
+
+        from transaction import CoordinatorLog
+        from transaction.tests.test__recovery import RecoverableDM
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        log = CoordinatorLog(os.path.join(tmpdir, 'coordinator.log'))
+        self.addCleanup(log.close)
+        coordinator = self._makeOne()
+        coordinator.managers[0].coordinator_log = log
+        txn1, txn2 = coordinator.begin()
+        ids = txn1.id, txn2.id
+        a = RecoverableDM('a', fail='tpc_finish')
+        b = RecoverableDM('b')
+        txn1.join(b)
+        txn2.join(a)
+        self.assertRaises(ValueError, coordinator.commit)
+        self.assertEqual((txn1.id, txn2.id), ids)
+        self.assertEqual(b.finished, [txn1.id])
+        log.compact()
+        a = RecoverableDM('a')
+        self.assertEqual(log.recover([a, b]), [])
+        self.assertEqual(a.recovered, [txn2.id])
+        self.assertEqual(b.recovered, [txn1.id])
+
+    def test_context_manager(self):
+        calls = []
+        coordinator = self._makeOne()
+        with coordinator as (txn1, txn2):
+            txn1.join(DM('a', calls))
+            txn2.join(DM('b', calls))
+        self.assertEqual(calls[-1][:2], ('tpc_finish', 'b'))
+        del calls[:]
+        with self.assertRaises(KeyError):
+            with coordinator as (txn1, txn2):
+                txn1.join(DM('a', calls))
+                raise KeyError
+        self.assertEqual([method for method, _, _ in calls], ['abort'])
+
+    def test_doom(self):
+        coordinator = self._makeOne()
+        coordinator.doom()
+        self.assertTrue(all(txn.isDoomed() for txn in coordinator.get()))
+
+    def test_abort_continues_after_failure(self):
+        calls = []
+        coordinator = self._makeOne()
+        txn1, txn2 = coordinator.begin()
+        txn1.join(DM('a', calls, fail='abort'))
+        txn2.join(DM('b', calls))
+        self.assertRaises(ValueError, coordinator.abort)
+        self.assertEqual([key for method, key, _ in calls
+                          if method == 'abort'], ['a', 'b'])
+
+
+class DM:
+
+    def __init__(self, key, calls, fail=None):
+        self.key = key
+        self.calls = calls
+        self.fail = fail
+
+    def _call(self, method, txn):
+        self.calls.append((method, self.key, txn))
+        if self.fail == method:
+            raise ValueError(method)
+
+    def sortKey(self):
+        return self.key
+
+    def abort(self, txn):
+        self._call('abort', txn)
+
+    def tpc_begin(self, txn):
+        self._call('tpc_begin', txn)
+
+    def commit(self, txn):
+        self._call('commit', txn)
+
+    def tpc_vote(self, txn):
+        self._call('tpc_vote', txn)
+
+    def tpc_finish(self, txn):
+        self._call('tpc_finish', txn)
+
+    def tpc_abort(self, txn):
+        self._call('tpc_abort', txn)
+
+
+class Synch:
+
+    def __init__(self):
+        self.before = []
+        self.after = []
+
+    def beforeCompletion(self, txn):
+        self.before.append(txn)
+
+    def afterCompletion(self, txn):
+        self.after.append(txn)
+
+    def newTransaction(self, txn):
+        pass
@@ -0,0 +1,303 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE
+#
+##############################################################################
+import os
+import shutil
+import tempfile
+import unittest
+
+
+@unittest.skipUnless(os.name == 'posix', 'requires POSIX')
+class _Base(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _makeJournal(self):
+        from transaction import Journal
+        journal = Journal(self.path)
+        self.addCleanup(journal.close)
+        return journal
+
+    def _makeDM(self, journal, **kw):
+        from transaction import JournalDataManager
+        from transaction import TransactionManager
+        tm = TransactionManager()
+        return tm, JournalDataManager(journal, tm, **kw)
+
+
+class JournalTests(_Base):
+
+    def test_empty(self):
+        journal = self._makeJournal()
+        self.assertEqual(len(journal), 0)
+        self.assertEqual(journal.inDoubt(), [])
+        self.assertEqual(os.path.getsize(self.path), 1 << 20)
+
+    def test_prepare_syncs_finish_doesnt(self):
+        from transaction import _recovery
+        from transaction.tests.common import Monkey
+        journal = self._makeJournal()
+        syncs = []
+
+        def _fsync(fd):
+            syncs.append(fd)
+        with Monkey(_recovery, _fsync=_fsync):
+            journal.prepare('t1', {'a': b'1', 'b': None})
+            self.assertEqual(len(syncs), 1)
+            self.assertEqual(journal.inDoubt(), ['t1'])
+            self.assertEqual(len(journal), 0)
+            journal.finish('t1')
+            journal.finish('t1')
+            self.assertEqual(len(syncs), 1)
+        self.assertEqual(journal.inDoubt(), [])
+        self.assertEqual(bytes(journal._index['a']), b'1')
+
+    def test_reopen(self):
+        journal = self._makeJournal()
+        journal.prepare('t1', {'a': b'1', 'b': b'2'})
+        journal.finish('t1')
+        journal.prepare('t2', {'a': None, 'c': b'3'})
+        journal.finish('t2')
+        journal.prepare('t3', {'c': b'x'})
+        journal.abort('t3')
+        journal.abort('t3')
+        journal.prepare('t4', {'d': b'4'})
+        journal.close()
+        journal = self._makeJournal()
+        self.assertEqual({k: bytes(v) for k, v in journal._index.items()},
+                         {'b': b'2', 'c': b'3'})
+        self.assertEqual(journal.inDoubt(), ['t4'])
+        journal.finish('t4')
+        self.assertEqual(bytes(journal._index['d']), b'4')
+
+    def test_torn_write_is_ignored_and_overwritten(self):
+        journal = self._makeJournal()
+        journal.prepare('t1', {'a': b'1'})
+        journal.finish('t1')
+        end = journal._end
+        journal.prepare('t2', {'b': b'2' * 100})
+        journal.close()
+        with open(self.path, 'r+b') as f:
+            f.seek(end + 50)
+            f.write(b'XX')
+        journal = self._makeJournal()
+        self.assertEqual(journal._end, end)
+        self.assertEqual(journal.inDoubt(), [])
+        # What was after the end was zeroed.
+        with open(self.path, 'rb') as f:
+            f.seek(end)
+            self.assertEqual(f.read(200), bytes(200))
+
+    def test_grows(self):
+        journal = self._makeJournal()
+        value = b'x' * (600 << 10)
+        journal.prepare('t1', {'a': value})
+        journal.finish('t1')
+        first = journal._index['a']
+        journal.prepare('t2', {'b': value})
+        journal.finish('t2')
+        self.assertEqual(os.path.getsize(self.path), 2 << 20)
+        # Views of the previous map stay valid.
+        self.assertEqual(bytes(first), value)
+        self.assertEqual(bytes(journal._index['b']), value)
+
+    def test_compact(self):
+        journal = self._makeJournal()
+        for i in range(100):
+            journal.prepare('t%d' % i, {'a': b'%d' % i, 'b%d' % i: None})
+            journal.finish('t%d' % i)
+        journal.prepare('pending', {'c': b'c', 'a': None})
+        end = journal._end
+        view = journal._index['a']
+        journal.compact()
+        self.assertLess(journal._end, end)
+        self.assertEqual(bytes(view), b'99')
+        self.assertEqual(bytes(journal._index['a']), b'99')
+        self.assertEqual(journal.inDoubt(), ['pending'])
+        journal.finish('pending')
+        self.assertEqual(sorted(journal._index), ['c'])
+        journal.close()
+        journal = self._makeJournal()
+        self.assertEqual({k: bytes(v) for k, v in journal._index.items()},
+                         {'c': b'c'})
+
+
+class JournalDataManagerTests(_Base):
+
+    def test_class_conforms_to_interfaces(self):
+        from zope.interface.verify import verifyClass
+
+        from transaction import JournalDataManager
+        from transaction.interfaces import IRecoverableDataManager
+        from transaction.interfaces import ISavepointDataManager
+        verifyClass(IRecoverableDataManager, JournalDataManager)
+        verifyClass(ISavepointDataManager, JournalDataManager)
+
+    def test_sortKey(self):
+        journal = self._makeJournal()
+        self.assertEqual(self._makeDM(journal)[1].sortKey(),
+                         'JournalDataManager:' + self.path)
+        self.assertEqual(self._makeDM(journal, name='j')[1].sortKey(), 'j')
+
+    def test_commit_and_read(self):
+        journal = self._makeJournal()
+        tm, dm = self._makeDM(journal)
+        dm['a'] = b'1'
+        dm['b'] = bytearray(b'2')
+        self.assertEqual(dm['b'], b'2')
+        tm.commit()
+        value = dm['a']
+        self.assertIsInstance(value, memoryview)
+        self.assertTrue(value.readonly)
+        self.assertEqual(bytes(value), b'1')
+        del dm['a']
+        tm.commit()
+        self.assertEqual(sorted(dm), ['b'])
+        # Other data managers see the committed data.
+        other = self._makeDM(journal)[1]
+        self.assertEqual({k: bytes(v) for k, v in other.committed.items()},
+                         {'b': b'2'})
+        journal.close()
+        journal = self._makeJournal()
+        dm = self._makeDM(journal)[1]
+        self.assertEqual(bytes(dm['b']), b'2')
+
+    def test_setitem_w_invalid_types(self):
+        journal = self._makeJournal()
+        dm = self._makeDM(journal)[1]
+        self.assertRaises(TypeError, dm.__setitem__, 1, b'1')
+        self.assertRaises(TypeError, dm.__setitem__, 'a', 'text')
+
+    def test_abort_after_vote(self):
+        journal = self._makeJournal()
+        tm, dm = self._makeDM(journal)
+        dm['a'] = b'1'
+        txn = tm.get()
+        txn.join(FailingDM())
+        self.assertRaises(ValueError, tm.commit)
+        tm.abort()
+        self.assertEqual(journal.inDoubt(), [])
+        self.assertNotIn('a', dm)
+        journal.close()
+        self.assertEqual(self._makeJournal().inDoubt(), [])
+
+    def test_savepoints(self):
+        journal = self._makeJournal()
+        tm, dm = self._makeDM(journal)
+        dm['a'] = b'1'
+        sp = tm.savepoint()
+        dm['b'] = b'2'
+        sp.rollback()
+        tm.commit()
+        self.assertEqual(sorted(dm), ['a'])
+
+    def test_empty_commit_writes_nothing(self):
+        journal = self._makeJournal()
+        tm, dm = self._makeDM(journal)
+        sp = tm.savepoint()
+        dm['a'] = b'1'
+        sp.rollback()
+        tm.commit()
+        self.assertEqual(journal._end, 0)
+
+    def test_recover_w_coordinator_log(self):
+        from transaction import CoordinatorLog
+        log = CoordinatorLog(os.path.join(self.tmpdir, 'coordinator'))
+        self.addCleanup(log.close)
+        journal = self._makeJournal()
+        tm, dm = self._makeDM(journal, name='journal')
+        dm['a'] = b'1'
+        txn = tm.get()
+        dm.tpc_begin(txn)
+        dm.commit(txn)
+        dm.tpc_vote(txn)
+        log.logCommit(txn, [dm])
+        # The process dies before finishing; the journal is reopened.
+        journal.close()
+        journal = self._makeJournal()
+        self.assertEqual(journal.inDoubt(), [txn.id])
+        dm = self._makeDM(journal, name='journal')[1]
+        self.assertNotIn('a', dm)
+        self.assertEqual(log.recover([dm]), [])
+        self.assertEqual(bytes(dm['a']), b'1')
+        self.assertEqual(journal.inDoubt(), [])
+        # Recovering again does nothing.
+        dm.recover(txn.id)
+
+    def test_concurrent_commits_share_syncs(self):
+        import threading
+
+        from transaction import _recovery
+        from transaction.tests.common import Monkey
+        journal = self._makeJournal()
+        syncs = []
+        barrier = threading.Barrier(8)
+
+        def _fsync(fd):
+            syncs.append(fd)
+            os.fsync(fd)
+
+        def _commit(n):
+            tm, dm = self._makeDM(journal)
+            barrier.wait()
+            for i in range(20):
+                dm['%d-%d' % (n, i)] = b'x'
+                tm.commit()
+        with Monkey(_recovery, _fsync=_fsync):
+            threads = [threading.Thread(target=_commit, args=(n,))
+                       for n in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(len(journal), 8 * 20)
+        self.assertLessEqual(len(syncs), 8 * 20)
+
+
+class NonPOSIXTests(unittest.TestCase):
+
+    def test_ctor(self):
+        from unittest import mock
+
+        from transaction import Journal
+        with mock.patch('os.name', 'nt'):
+            self.assertRaises(NotImplementedError, Journal, 'journal')
+
+
+class FailingDM:
+
+    def sortKey(self):
+        return 'z'
+
+    def abort(self, txn):
+        pass
+
+    def tpc_begin(self, txn):
+        pass
+
+    def commit(self, txn):
+        pass
+
+    def tpc_vote(self, txn):
+        raise ValueError('tpc_vote')
+
+    def tpc_finish(self, txn):
+        pass
+
+    def tpc_abort(self, txn):
+        pass
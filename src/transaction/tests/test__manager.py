@@ -11,6 +11,7 @@
 # FOR A PARTICULAR PURPOSE
 #
 ##############################################################################
+import os
 import unittest
 from unittest import mock
 
@@ -106,6 +107,24 @@ class TransactionManagerTests(unittest.TestCase):
         tm.free(txn)
         self.assertIsNone(tm._txn)
 
+    def test_get_from_many_threads_creates_one_txn(self):
+        import threading
+        tm = self._makeOne()
+        barrier = threading.Barrier(8)
+        seen = []
+
+        def _get():
+            barrier.wait()
+            seen.append(tm.get())
+        threads = [threading.Thread(target=_get) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(seen), 8)
+        for txn in seen:
+            self.assertIs(txn, tm._txn)
+
     def test_registerSynch(self):
         tm = self._makeOne()
         synch = DummySynch()
@@ -139,6 +158,86 @@ class TransactionManagerTests(unittest.TestCase):
         tm.clearSynchs()
         self.assertEqual(len(tm._synchs), 0)
 
+    def test_hookStats(self):
+        tm = self._makeOne()
+        self.assertEqual(tm.hookStats(), {})
+        txn = tm.begin()
+        txn.addBeforeCommitHook(_stats_hook)
+        txn.addAfterCommitHook(_StatsHook())
+        tm.commit()
+        txn = tm.begin()
+        txn.addBeforeCommitHook(_stats_hook)
+        tm.commit()
+        stats = tm.hookStats()
+        self.assertEqual(sorted(stats), [
+            __name__ + '._StatsHook',
+            __name__ + '._stats_hook',
+        ])
+        calls, seconds = stats[__name__ + '._stats_hook']
+        self.assertEqual(calls, 2)
+        self.assertGreaterEqual(seconds, 0)
+        self.assertEqual(stats[__name__ + '._StatsHook'][0], 1)
+        tm.clearHookStats()
+        self.assertEqual(tm.hookStats(), {})
+
+    def test_hookStats_w_failing_hook(self):
+        tm = self._makeOne()
+        txn = tm.begin()
+
+        def _fail():
+            raise ValueError()
+        txn.addBeforeCommitHook(_fail)
+        self.assertRaises(ValueError, tm.commit)
+        tm.abort()
+        self.assertEqual(list(tm.hookStats().values()), [(1, mock.ANY)])
+
+    def test_hookStats_per_manager(self):
+        tm = self._makeOne()
+        other = self._makeOne()
+        txn = other.begin()
+        txn.addBeforeCommitHook(_stats_hook)
+        other.commit()
+        self.assertEqual(tm.hookStats(), {})
+        self.assertEqual(list(other.hookStats()), [__name__ + '._stats_hook'])
+        tm.clearHookStats()
+        self.assertEqual(list(other.hookStats()), [__name__ + '._stats_hook'])
+
+    def test_hookStats_w_partial(self):
+        import functools
+        tm = self._makeOne()
+        txn = tm.begin()
+        txn.addBeforeCommitHook(functools.partial(_stats_hook, 1))
+        txn.addBeforeCommitHook(
+            functools.partial(functools.partial(_StatsHook(), 1), 2))
+        tm.commit()
+        self.assertEqual(sorted(tm.hookStats()), [
+            __name__ + '._StatsHook',
+            __name__ + '._stats_hook',
+        ])
+
+    def test_slow_hook_threshold(self):
+        from transaction import _transaction
+        from transaction.tests.common import DummyLogger
+        from transaction.tests.common import Monkey
+        tm = self._makeOne()
+        self.assertIsNone(tm.slow_hook_threshold)
+        logger = DummyLogger()
+        with Monkey(_transaction, _LOGGER=logger):
+            txn = tm.begin()
+        txn.addBeforeCommitHook(_stats_hook)
+        tm.commit()
+        self.assertEqual(
+            [entry for entry in logger._log if entry[0] == 'warning'], [])
+        tm.slow_hook_threshold = 0
+        with Monkey(_transaction, _LOGGER=logger):
+            txn = tm.begin()
+        txn.addBeforeCommitHook(_stats_hook)
+        tm.commit()
+        warnings = [msg for level, msg in logger._log if level == 'warning']
+        self.assertEqual(len(warnings), 1)
+        self.assertTrue(warnings[0].startswith(
+            'Slow hook %s._stats_hook took ' % __name__))
+
     def test_isDoomed_wo_existing_txn(self):
         tm = self._makeOne()
         self.assertFalse(tm.isDoomed())
@@ -470,6 +569,335 @@ class TransactionManagerTests(unittest.TestCase):
         result = transaction.manager.run(Callable())
         self.assertEqual(result, 42)
 
+    def test_arun(self):
+        import asyncio
+
+        from transaction.interfaces import TransientError
+        from transaction.tests.savepointsample import \
+            SampleSavepointDataManager
+        tm = self._makeOne()
+        dm = SampleSavepointDataManager(tm)
+        i = [0, None]
+
+        async def meaning():
+            """Nice doc"""
+            i[0] += 1
+            i[1] = tm.get()
+            dm[i[0]] = i[0]
+            await asyncio.sleep(0)
+            if i[0] < 3:
+                raise TransientError
+            return 42
+
+        self.assertEqual(asyncio.run(tm.arun(meaning)), 42)
+        self.assertEqual(i[0], 3)
+        self.assertEqual(i[1].description, "meaning\n\nNice doc")
+        self.assertEqual(list(dm.committed), [3])
+
+    def test_arun_gives_up_and_propagates_errors(self):
+        import asyncio
+
+        from transaction.interfaces import TransientError
+        tm = self._makeOne()
+        i = [0]
+
+        async def _():
+            i[0] += 1
+            raise TransientError
+
+        with self.assertRaises(TransientError):
+            asyncio.run(tm.arun(_, 2))
+        self.assertEqual(i[0], 2)
+
+        async def _():
+            i[0] += 1
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            asyncio.run(tm.arun(_))
+        self.assertEqual(i[0], 3)
+        self.assertIsNot(tm.get(), None)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(tm.arun(_, 0))
+
+    def test_arun_backoff(self):
+        import asyncio
+        from unittest import mock
+
+        from transaction.interfaces import TransientError
+        tm = self._makeOne()
+        i = [0]
+
+        async def _():
+            i[0] += 1
+            if i[0] < 4:
+                raise TransientError
+
+        with mock.patch('asyncio.sleep', mock.AsyncMock()) as sleep:
+            asyncio.run(tm.arun(_, 4, backoff=0.5))
+        self.assertEqual([c.args for c in sleep.await_args_list],
+                         [(0.5,), (1.0,), (2.0,)])
+
+    def test_arun_concurrently_w_separate_managers(self):
+        import asyncio
+
+        from transaction.interfaces import TransientError
+        from transaction.tests.savepointsample import \
+            SampleSavepointDataManager
+        tries = {}
+
+        async def work(n):
+            tm = self._makeOne()
+            dm = SampleSavepointDataManager(tm)
+
+            async def _():
+                tries[n] = tries.get(n, 0) + 1
+                dm[n] = n
+                await asyncio.sleep(0)
+                if tries[n] < 2:
+                    raise TransientError
+            await tm.arun(_)
+            return dm.committed
+
+        async def main():
+            return await asyncio.gather(*[work(n) for n in range(5)])
+        results = asyncio.run(main())
+        self.assertEqual(results, [{n: n} for n in range(5)])
+        self.assertEqual(tries, {n: 2 for n in range(5)})
+
+    def test_aattempts(self):
+        import asyncio
+        from unittest import mock
+
+        from transaction._manager import Attempt
+        from transaction.interfaces import TransientError
+        tm = self._makeOne()
+        runs = []
+
+        async def main():
+            async for attempt in tm.aattempts(3, backoff=1):
+                with attempt:
+                    runs.append(attempt)
+                    await asyncio.sleep(0)
+                    if len(runs) < 2:
+                        raise TransientError
+
+        with mock.patch('asyncio.sleep', mock.AsyncMock()) as sleep:
+            asyncio.run(main())
+        self.assertEqual(len(runs), 2)
+        self.assertIsInstance(runs[0], Attempt)
+        # The backoff, between the block's own sleeps.
+        self.assertEqual([c.args for c in sleep.await_args_list],
+                         [(0,), (1,), (0,)])
+
+    def test_aattempts_last_is_manager(self):
+        import asyncio
+        tm = self._makeOne()
+
+        async def collect(number):
+            return [attempt async for attempt in tm.aattempts(number)]
+        found = asyncio.run(collect(3))
+        self.assertEqual(len(found), 3)
+        self.assertIs(found[-1], tm)
+        with self.assertRaises(ValueError):
+            asyncio.run(collect(0))
+
+    def test_submit_thread_pool(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        import transaction
+        from transaction.interfaces import TransientError
+        tm = self._makeOne()
+        txn = tm.begin()
+        txn.user = 'bob'
+        txn.note('parent')
+        txn.extension['request'] = 1
+        calls = []
+
+        def work(a, b=0):
+            """Work."""
+            calls.append(a)
+            if len(calls) < 2:
+                raise TransientError
+            current = transaction.get()
+            return (a + b, current.user, current.description,
+                    current.extension, current is txn)
+
+        with ThreadPoolExecutor(1) as executor:
+            future = tm.submit(executor, work, 1, b=2, tries=2)
+            self.assertEqual(future.result(), (
+                3, 'bob', 'parent\nwork\n\nWork.', {'request': 1},
+                False))
+        self.assertEqual(calls, [1, 1])
+        # The submitting transaction is untouched.
+        self.assertIs(tm.get(), txn)
+
+    def test_submit_gives_up(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        from transaction.interfaces import TransientError
+        tm = self._makeOne()
+        calls = []
+
+        def work():
+            calls.append(1)
+            raise TransientError
+
+        with ThreadPoolExecutor(1) as executor:
+            future = tm.submit(executor, work)
+            self.assertRaises(TransientError, future.result)
+        self.assertEqual(len(calls), 3)
+        self.assertIsNone(tm._txn)
+        with self.assertRaises(ValueError):
+            tm.submit(executor, work, tries=0)
+
+    def test_submit_process_pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+        tm = self._makeOne()
+        txn = tm.begin()
+        txn.user = 'bob'
+        txn.extension['request'] = 1
+        with ProcessPoolExecutor(2) as executor:
+            futures = [tm.submit(executor, _describeTransaction, i)
+                       for i in range(3)]
+            results = [future.result() for future in futures]
+        self.assertEqual(results, [
+            (i, 'bob', '_describeTransaction', {'request': 1})
+            for i in range(3)])
+
+    def test_chunked(self):
+        from transaction.tests.savepointsample import \
+            SampleSavepointDataManager
+        tm = self._makeOne()
+        dm = SampleSavepointDataManager(tm)
+
+        def _store(item):
+            dm[item] = item
+            return item * 2
+        chunks = tm.chunked(range(7), _store, size=3)
+        self.assertEqual(next(chunks), [0, 2, 4])
+        self.assertEqual(sorted(dm.committed), [0, 1, 2])
+        self.assertEqual(list(chunks), [[6, 8, 10], [12]])
+        self.assertEqual(sorted(dm.committed), list(range(7)))
+
+    def test_chunked_is_lazy(self):
+        tm = self._makeOne()
+        consumed = []
+
+        def _items():
+            for i in range(10):
+                consumed.append(i)
+                yield i
+        chunks = tm.chunked(_items(), lambda item: item, size=4)
+        self.assertEqual(consumed, [])
+        next(chunks)
+        self.assertEqual(consumed, [0, 1, 2, 3])
+
+    def test_chunked_retries_batch(self):
+        from transaction.interfaces import TransientError
+        from transaction.tests.savepointsample import \
+            SampleSavepointDataManager
+        tm = self._makeOne()
+        dm = SampleSavepointDataManager(tm)
+        calls = []
+
+        def _store(item):
+            calls.append(item)
+            dm[item] = item
+            if item == 4 and calls.count(4) == 1:
+                raise TransientError
+            return item
+        self.assertEqual(list(tm.chunked(range(6), _store, size=3)),
+                         [[0, 1, 2], [3, 4, 5]])
+        self.assertEqual(calls, [0, 1, 2, 3, 4, 3, 4, 5])
+        self.assertEqual(sorted(dm.committed), list(range(6)))
+
+    def test_chunked_gives_up(self):
+        from transaction.interfaces import TransientError
+        from transaction.tests.savepointsample import \
+            SampleSavepointDataManager
+        tm = self._makeOne()
+        dm = SampleSavepointDataManager(tm)
+
+        def _store(item):
+            dm[item] = item
+            if item == 3:
+                raise TransientError
+        chunks = tm.chunked(range(6), _store, size=2, tries=2)
+        next(chunks)
+        with self.assertRaises(TransientError):
+            next(chunks)
+        self.assertEqual(sorted(dm.committed), [0, 1])
+
+    def test_chunked_w_savepoints(self):
+        from transaction.tests.savepointsample import \
+            SampleSavepointDataManager
+        tm = self._makeOne()
+        dm = SampleSavepointDataManager(tm)
+        savepoints = []
+        orig = tm.savepoint
+
+        def _savepoint(optimistic=False):
+            savepoints.append(sorted(dm.uncommitted))
+            return orig(optimistic)
+        tm.savepoint = _savepoint
+
+        def _store(item):
+            dm[item] = item
+        list(tm.chunked(range(5), _store, size=5, savepoint=2))
+        self.assertEqual(savepoints, [[0, 1], [0, 1, 2, 3]])
+
+    def test_chunked_adapts_size_to_latency(self):
+        tm = self._makeOne()
+        sizes = []
+
+        def _commit(orig=tm.commit):
+            sizes.append(len(tm.get().extension['items']))
+            return orig()
+        tm.commit = _commit
+
+        def _item(item):
+            tm.get().extension.setdefault('items', []).append(item)
+        # Committing is (much) faster than an hour: grow (up to twice
+        # the size each time).
+        list(tm.chunked(range(100), _item, size=5, latency=3600))
+        self.assertEqual(sizes, [5, 10, 20, 40, 25])
+        # Committing is slower than a picosecond: shrink.
+        del sizes[:]
+        list(tm.chunked(range(17), _item, size=8, latency=1e-12))
+        self.assertEqual(sizes, [8, 4, 2, 1, 1, 1])
+
+    def test_chunked_w_batch_sizer(self):
+        from transaction import BatchSizer
+        from transaction.interfaces import TransientError
+        tm = self._makeOne()
+        sizer = BatchSizer(4, increase=2)
+        failed = []
+
+        def _item(item):
+            if item == 7 and not failed:
+                failed.append(item)
+                raise TransientError
+            return item
+        chunks = list(tm.chunked(range(20), _item, size=sizer))
+        # 4 items, then 6, where 7 conflicts once (the batch is
+        # retried as is, and the size drops to 3, then grows to 5),
+        # then 5 and the remaining 5.
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 6, 5, 5])
+        self.assertEqual(sizer.commits, 4)
+        self.assertEqual(sizer.conflicts, 1)
+        self.assertIsNotNone(sizer.commit_time)
+        with self.assertRaises(ValueError):
+            next(tm.chunked([1], id, size=sizer, latency=1))
+
+    def test_chunked_w_invalid_arguments(self):
+        tm = self._makeOne()
+        with self.assertRaises(ValueError):
+            next(tm.chunked([1], id, size=0))
+        with self.assertRaises(ValueError):
+            next(tm.chunked([1], id, savepoint=0))
+
     def test__retryable_w_transient_error(self):
         from transaction.interfaces import TransientError
         tm = self._makeOne()
@@ -509,6 +937,47 @@ class TransactionManagerTests(unittest.TestCase):
         tm.get()._resources.append(res2)
         self.assertTrue(tm._retryable(Exception, object()))
 
+    def test__retryable_w_declared_types(self):
+        from transaction import RetryRegistry
+        from transaction.interfaces import TransientError
+
+        class NotTransient(TransientError):
+            pass
+
+        class _Resource:
+            asked = 0
+
+            def should_retry(self, err):
+                self.asked += 1
+                return True
+        tm = self._makeOne()
+        tm.retry_registry = RetryRegistry()
+        tm.retry_registry.declare(NotTransient, False)
+        tm.retry_registry.declare(LookupError)
+        resource = _Resource()
+        tm.get()._resources.append(resource)
+        self.assertFalse(tm._retryable(NotTransient, object()))
+        self.assertTrue(tm._retryable(KeyError, object()))
+        self.assertEqual(resource.asked, 0)
+        self.assertTrue(tm._retryable(ValueError, object()))
+        self.assertEqual(resource.asked, 1)
+        # Other managers use the shared registry.
+        self.assertIsNone(self._makeOne().retry_registry.classify(KeyError))
+
+    def test_run_doesnt_retry_declared_non_retryable(self):
+        from transaction import RetryRegistry
+        from transaction.interfaces import TransientError
+        tm = self._makeOne()
+        tm.retry_registry = RetryRegistry()
+        tm.retry_registry.declare(TransientError, False)
+        calls = []
+
+        def func():
+            calls.append(1)
+            raise TransientError()
+        self.assertRaises(TransientError, tm.run, func)
+        self.assertEqual(calls, [1])
+
     # basic tests with two sub trans jars
     # really we only need one, so tests for
     # sub1 should identical to tests for sub2
@@ -789,6 +1258,94 @@ class TestThreadTransactionManager(unittest.TestCase):
         sync.beforeCompletion.assert_not_called()
         sync.afterCompletion.assert_not_called()
 
+    def test_arun_aattempts_thread_local_manager(self):
+        import asyncio
+
+        import transaction
+
+        async def _():
+            return transaction.get()
+
+        async def collect():
+            return [a async for a in transaction.manager.aattempts(2)]
+        txn = asyncio.run(transaction.manager.arun(_))
+        self.assertIsNone(txn._manager)
+        self.assertEqual(len(asyncio.run(collect())), 2)
+
+    def test_submit_thread_local_manager(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        import transaction
+        with ThreadPoolExecutor(1) as executor:
+            future = transaction.manager.submit(
+                executor, _describeTransaction, 1)
+            self.assertEqual(future.result(),
+                             (1, '', '_describeTransaction', {}))
+
+    def test_retry_registry_thread_local_manager(self):
+        from transaction import RetryRegistry
+        from transaction import ThreadTransactionManager
+        tm = ThreadTransactionManager()
+        self.assertIs(tm.retry_registry, tm.manager.retry_registry)
+        registry = RetryRegistry()
+        tm.retry_registry = registry
+        self.assertIs(tm.manager.retry_registry, registry)
+
+    def test_chunked_thread_local_manager(self):
+        import transaction
+        self.assertEqual(
+            list(transaction.manager.chunked(range(3), str, size=2)),
+            [['0', '1'], ['2']])
+
+    def test_hookStats_thread_local_manager(self):
+        import transaction
+        transaction.manager.clearHookStats()
+        self.assertIsNone(transaction.manager.slow_hook_threshold)
+        transaction.manager.slow_hook_threshold = 10
+        try:
+            self.assertEqual(transaction.manager.manager.slow_hook_threshold,
+                             10)
+            txn = transaction.begin()
+            txn.addBeforeCommitHook(_stats_hook)
+            transaction.commit()
+            self.assertEqual(list(transaction.manager.hookStats()),
+                             [__name__ + '._stats_hook'])
+        finally:
+            transaction.manager.slow_hook_threshold = None
+            transaction.manager.clearHookStats()
+        self.assertEqual(transaction.manager.hookStats(), {})
+
+    def test_hookStats_thread_local_manager_w_threads(self):
+        import threading
+
+        from transaction import ThreadTransactionManager
+        from transaction import TransactionManager
+        from transaction import _transaction
+        from transaction.tests.common import DummyLogger
+        from transaction.tests.common import Monkey
+        tm = ThreadTransactionManager()
+        tm.clearHookStats()
+        self.addCleanup(tm.clearHookStats)
+        TransactionManager.slow_hook_threshold = 0
+        self.addCleanup(setattr, TransactionManager, 'slow_hook_threshold',
+                        None)
+        logger = DummyLogger()
+
+        def _commit():
+            with Monkey(_transaction, _LOGGER=logger):
+                txn = tm.begin()
+            txn.addBeforeCommitHook(_stats_hook)
+            tm.commit()
+
+        _commit()
+        thread = threading.Thread(target=_commit)
+        thread.start()
+        thread.join()
+        # Both threads recorded, and both used the threshold.
+        self.assertEqual(tm.hookStats()[__name__ + '._stats_hook'][0], 2)
+        warnings = [msg for level, msg in logger._log if level == 'warning']
+        self.assertEqual(len(warnings), 2)
+
     def test_explicit_thread_local_manager(self):
         import transaction.interfaces
 
@@ -802,6 +1359,82 @@ class TestThreadTransactionManager(unittest.TestCase):
         transaction.abort()
 
 
+class AfterForkTests(unittest.TestCase):
+
+    def _addHook(self, hook, *args, **kws):
+        from transaction import _manager
+        from transaction import addAfterForkHook
+        addAfterForkHook(hook, args, kws)
+        self.addCleanup(_manager._after_fork_hooks.pop)
+
+    def test_resetAfterFork_forgets_without_aborting(self):
+        from transaction import TransactionManager
+        tm = TransactionManager()
+        sync = mock.MagicMock()
+        tm.registerSynch(sync)
+        dm = mock.MagicMock()
+        txn = tm.begin()
+        txn.join(dm)
+        # Another thread of the parent was recording hook timings.
+        tm._hook_stats._lock.acquire()
+        tm._resetAfterFork()
+        self.assertFalse(tm.registeredSynchs())
+        self.assertIsNot(tm.get(), txn)
+        dm.abort.assert_not_called()
+        sync.beforeCompletion.assert_not_called()
+        # The manager keeps working.
+        tm.get().addBeforeCommitHook(_stats_hook)
+        tm.commit()
+        self.assertEqual(list(tm.hookStats()), [__name__ + '._stats_hook'])
+
+    def test_afterFork_resets_manager_then_calls_hooks(self):
+        from transaction import ThreadTransactionManager
+        from transaction._manager import _afterFork
+        tm = ThreadTransactionManager()
+        txn = tm.get()
+        calls = []
+
+        def hook(*args, **kws):
+            calls.append((tm.get() is txn, args, kws))
+
+        def broken():
+            raise ValueError('broken')
+        self._addHook(hook, 1, a=2)
+        self._addHook(broken)
+        self._addHook(hook)
+        with self.assertLogs('transaction._manager') as logs:
+            _afterFork(tm)
+        self.assertEqual(calls, [(False, (1,), {'a': 2}), (False, (), {})])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('broken', logs.records[0].getMessage())
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_fork(self):
+        import transaction
+        dm = mock.MagicMock()
+        calls = []
+        self._addHook(calls.append, 'hook')
+        txn = transaction.begin()
+        txn.join(dm)
+        try:
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover
+                code = 1
+                try:
+                    child = transaction.get()
+                    if (child is not txn and calls == ['hook']
+                            and not dm.abort.called):
+                        transaction.commit()
+                        code = 0
+                finally:
+                    os._exit(code)
+            _, status = os.waitpid(pid, 0)
+            self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+            self.assertIs(transaction.get(), txn)
+        finally:
+            transaction.abort()
+
+
 class AttemptTests(unittest.TestCase):
 
     def _makeOne(self, manager):
@@ -899,6 +1532,22 @@ class AttemptTests(unittest.TestCase):
         tm.commit()
 
 
+def _stats_hook(*args):
+    pass
+
+
+def _describeTransaction(i):
+    import transaction
+    txn = transaction.get()
+    return i, txn.user, txn.description, txn.extension
+
+
+class _StatsHook:
+
+    def __call__(self, *args):
+        pass
+
+
 class DummyManager:
     entered = False
     committed = False
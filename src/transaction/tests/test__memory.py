@@ -0,0 +1,146 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE
+#
+##############################################################################
+import unittest
+
+
+class MemoryDataManagerTests(unittest.TestCase):
+
+    def _getTargetClass(self):
+        from transaction import MemoryDataManager
+        return MemoryDataManager
+
+    def _makeOne(self, data=(), **kw):
+        from transaction import TransactionManager
+        self.tm = TransactionManager()
+        return self._getTargetClass()(data, self.tm, **kw)
+
+    def test_class_conforms_to_ISavepointDataManager(self):
+        from zope.interface.verify import verifyClass
+
+        from transaction.interfaces import ISavepointDataManager
+        verifyClass(ISavepointDataManager, self._getTargetClass())
+
+    def test_ctor_defaults(self):
+        import transaction
+        dm = self._getTargetClass()()
+        self.assertIs(dm.transaction_manager, transaction.manager)
+        self.assertEqual(dict(dm), {})
+        self.assertTrue(dm.sortKey().startswith('MemoryDataManager:'))
+        self.assertEqual(self._makeOne(name='dm').sortKey(), 'dm')
+
+    def test_mapping(self):
+        dm = self._makeOne({'a': 1, 'b': 2})
+        dm['c'] = 3
+        del dm['a']
+        dm['b'] = 4
+        self.assertEqual(dict(dm), {'b': 4, 'c': 3})
+        self.assertEqual(len(dm), 2)
+        self.assertNotIn('a', dm)
+        self.assertIn('c', dm)
+        self.assertRaises(KeyError, dm.__getitem__, 'a')
+        with self.assertRaises(KeyError):
+            del dm['a']
+        self.assertEqual(dm.committed, {'a': 1, 'b': 2})
+
+    def test_commit(self):
+        dm = self._makeOne({'a': 1, 'b': 2})
+        dm['c'] = 3
+        del dm['a']
+        self.assertEqual(list(self.tm.get()._resources), [dm])
+        self.tm.commit()
+        self.assertEqual(dm.committed, {'b': 2, 'c': 3})
+        self.assertIsNone(dm.transaction)
+        dm['d'] = 4
+        self.assertEqual(list(self.tm.get()._resources), [dm])
+
+    def test_abort(self):
+        dm = self._makeOne({'a': 1})
+        dm['a'] = 2
+        del dm['a']
+        self.tm.abort()
+        self.assertEqual(dict(dm), {'a': 1})
+        self.assertEqual(dm.committed, {'a': 1})
+
+    def test_no_changes_while_committing(self):
+        dm = self._makeOne()
+        dm['a'] = 1
+        dm.tpc_begin(self.tm.get())
+        with self.assertRaises(ValueError):
+            dm['b'] = 2
+
+    def test_no_changes_from_another_thread(self):
+        import threading
+
+        import transaction
+        dm = self._getTargetClass()()
+        self.addCleanup(transaction.abort)
+        dm['a'] = 1
+        errors = []
+
+        def _change():
+            try:
+                dm['b'] = 2
+            except ValueError as e:
+                errors.append(e)
+            finally:
+                transaction.abort()
+        thread = threading.Thread(target=_change)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(dict(dm), {'a': 1})
+        self.assertEqual(transaction.get()._resources, [dm])
+
+    def test_savepoints(self):
+        dm = self._makeOne({'a': 1, 'b': 2})
+        dm['a'] = 10
+        sp1 = self.tm.savepoint()
+        dm['a'] = 100
+        del dm['b']
+        dm['c'] = 3
+        sp2 = self.tm.savepoint()
+        dm['c'] = 30
+        del dm['a']
+        sp2.rollback()
+        self.assertEqual(dict(dm), {'a': 100, 'c': 3})
+        dm['d'] = 4
+        sp2.rollback()
+        self.assertEqual(dict(dm), {'a': 100, 'c': 3})
+        sp1.rollback()
+        self.assertEqual(dict(dm), {'a': 10, 'b': 2})
+        self.tm.commit()
+        self.assertEqual(dm.committed, {'a': 10, 'b': 2})
+
+    def test_savepoint_after_delete(self):
+        dm = self._makeOne({'a': 1})
+        del dm['a']
+        sp = self.tm.savepoint()
+        dm['a'] = 2
+        sp.rollback()
+        self.assertNotIn('a', dm)
+        self.tm.commit()
+        self.assertEqual(dm.committed, {})
+
+    def test_undo_log_grows_with_distinct_keys(self):
+        dm = self._makeOne()
+        for i in range(100):
+            dm[i % 3] = i
+        self.assertEqual(len(dm._undo), 3)
+        sp = self.tm.savepoint()
+        for i in range(100):
+            dm[i % 5] = i
+        self.assertEqual(len(dm._undo), 8)
+        sp.rollback()
+        self.assertEqual(len(dm._undo), 3)
+        self.assertEqual(dict(dm), {0: 99, 1: 97, 2: 98})
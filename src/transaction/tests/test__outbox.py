@@ -0,0 +1,269 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE
+#
+##############################################################################
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class _Base(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'outbox.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _makeStore(self):
+        from transaction import SQLiteOutboxStore
+        store = SQLiteOutboxStore(self.path)
+        self.addCleanup(store.close)
+        return store
+
+
+class SQLiteOutboxStoreTests(_Base):
+
+    def test_class_conforms_to_IOutboxStore(self):
+        from zope.interface.verify import verifyClass
+
+        from transaction import SQLiteOutboxStore
+        from transaction.interfaces import IOutboxStore
+        verifyClass(IOutboxStore, SQLiteOutboxStore)
+
+    def test_stage_commit_deliver(self):
+        store = self._makeStore()
+        store.stage('t1', [('q', b'1'), ('r', bytearray(b'2'))])
+        store.stage('t2', [('q', b'3')])
+        self.assertEqual(store.pending(10), [])
+        self.assertEqual(sorted(store.inDoubt()), ['t1', 't2'])
+        store.commit('t2')
+        store.commit('t1')
+        store.commit('t1')
+        self.assertEqual(store.inDoubt(), [])
+        pending = store.pending(2)
+        self.assertEqual([(d, p) for _, d, p in pending],
+                         [('q', b'1'), ('r', b'2')])
+        store.delivered([id for id, _, _ in pending])
+        self.assertEqual([(d, p) for _, d, p in store.pending(10)],
+                         [('q', b'3')])
+
+    def test_discard(self):
+        store = self._makeStore()
+        store.stage('t1', [('q', b'1')])
+        store.stage('t2', [('q', b'2')])
+        store.commit('t2')
+        store.discard('t1')
+        store.discard('t2')
+        self.assertEqual(store.inDoubt(), [])
+        self.assertEqual([p for _, _, p in store.pending(10)], [b'2'])
+
+    def test_failed_write_is_rolled_back(self):
+        store = self._makeStore()
+        with self.assertRaises(Exception):
+            store.stage('t1', [('q', b'1'), (None, b'2')])
+        self.assertEqual(store.inDoubt(), [])
+
+    def test_persistent(self):
+        store = self._makeStore()
+        store.stage('t1', [('q', b'1')])
+        store.close()
+        store = self._makeStore()
+        self.assertEqual(store.inDoubt(), ['t1'])
+
+
+class OutboxTests(_Base):
+
+    def _makeOne(self, store=None, **kw):
+        from transaction import Outbox
+        self.delivered = []
+        if store is None:
+            store = self._makeStore()
+        outbox = Outbox(store, self.delivered.append, **kw)
+        self.addCleanup(outbox.stop)
+        return outbox
+
+    def _makeDM(self, outbox, **kw):
+        from transaction import OutboxDataManager
+        from transaction import TransactionManager
+        tm = TransactionManager()
+        return tm, OutboxDataManager(outbox, tm, **kw)
+
+    def test_class_conforms_to_interfaces(self):
+        from zope.interface.verify import verifyClass
+
+        from transaction import OutboxDataManager
+        from transaction.interfaces import IRecoverableDataManager
+        from transaction.interfaces import ISavepointDataManager
+        verifyClass(IRecoverableDataManager, OutboxDataManager)
+        verifyClass(ISavepointDataManager, OutboxDataManager)
+
+    def test_commit_then_flush(self):
+        outbox = self._makeOne(batch_size=2)
+        tm, dm = self._makeDM(outbox)
+        dm.send('q', b'1')
+        dm.send('q', b'2')
+        dm.send('r', b'3')
+        self.assertEqual(outbox.flush(), 0)
+        tm.commit()
+        self.assertEqual(self.delivered, [])
+        self.assertEqual(outbox.flush(), 3)
+        self.assertEqual(self.delivered,
+                         [[('q', b'1'), ('q', b'2')], [('r', b'3')]])
+        self.assertEqual(outbox.flush(), 0)
+
+    def test_abort(self):
+        outbox = self._makeOne()
+        tm, dm = self._makeDM(outbox)
+        dm.send('q', b'1')
+        tm.abort()
+        tm.commit()
+        self.assertEqual(outbox.flush(), 0)
+
+    def test_abort_after_vote(self):
+        outbox = self._makeOne()
+        tm, dm = self._makeDM(outbox, name='a')
+        dm.send('q', b'1')
+        tm.get().join(FailingDM())
+        self.assertRaises(ValueError, tm.commit)
+        tm.abort()
+        self.assertEqual(outbox.store.inDoubt(), [])
+        self.assertEqual(outbox.flush(), 0)
+
+    def test_no_sending_while_committing(self):
+        outbox = self._makeOne()
+        tm, dm = self._makeDM(outbox)
+        dm.send('q', b'1')
+        txn = tm.get()
+        dm.tpc_begin(txn)
+        dm.tpc_vote(txn)
+        self.assertRaises(ValueError, dm.send, 'q', b'2')
+
+    def test_no_sending_from_another_thread(self):
+        import threading
+
+        import transaction
+        from transaction import OutboxDataManager
+        outbox = self._makeOne()
+        dm = OutboxDataManager(outbox)
+        self.addCleanup(transaction.abort)
+        dm.send('q', b'1')
+        errors = []
+
+        def _send():
+            try:
+                dm.send('q', b'2')
+            except ValueError as e:
+                errors.append(e)
+            finally:
+                transaction.abort()
+        thread = threading.Thread(target=_send)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(errors), 1)
+        transaction.commit()
+        outbox.flush()
+        self.assertEqual(self.delivered, [[('q', b'1')]])
+
+    def test_savepoints(self):
+        outbox = self._makeOne()
+        tm, dm = self._makeDM(outbox)
+        dm.send('q', b'1')
+        sp = tm.savepoint()
+        dm.send('q', b'2')
+        sp.rollback()
+        tm.commit()
+        outbox.flush()
+        self.assertEqual(self.delivered, [[('q', b'1')]])
+
+    def test_sortKey(self):
+        outbox = self._makeOne()
+        self.assertTrue(self._makeDM(outbox)[1].sortKey().startswith(
+            'OutboxDataManager:'))
+        self.assertEqual(self._makeDM(outbox, name='o')[1].sortKey(), 'o')
+
+    def test_recover(self):
+        from transaction import CoordinatorLog
+        log = CoordinatorLog(os.path.join(self.tmpdir, 'coordinator'))
+        self.addCleanup(log.close)
+        outbox = self._makeOne()
+        tm, dm = self._makeDM(outbox, name='outbox')
+        dm.send('q', b'1')
+        txn = tm.get()
+        dm.tpc_begin(txn)
+        dm.tpc_vote(txn)
+        log.logCommit(txn, [dm])
+        # The process dies before finishing.
+        self.assertEqual(outbox.store.inDoubt(), [txn.id])
+        dm = self._makeDM(outbox, name='outbox')[1]
+        self.assertEqual(log.recover([dm]), [])
+        self.assertEqual(outbox.flush(), 1)
+
+    def test_background_delivery(self):
+        import threading
+        outbox = self._makeOne(interval=3600)
+        delivered = threading.Event()
+        outbox.deliver = lambda messages: delivered.set()
+        outbox.start()
+        tm, dm = self._makeDM(outbox)
+        dm.send('q', b'1')
+        tm.commit()
+        # The commit woke the thread up.
+        self.assertTrue(delivered.wait(10))
+        outbox.stop()
+        self.assertIsNone(outbox._thread)
+
+    def test_background_delivery_retries(self):
+        import threading
+        outbox = self._makeOne(interval=0.01)
+        delivered = threading.Event()
+        failures = []
+
+        def _deliver(messages):
+            if not failures:
+                failures.append(messages)
+                raise OSError('queue down')
+            delivered.set()
+        outbox.deliver = _deliver
+        tm, dm = self._makeDM(outbox)
+        dm.send('q', b'1')
+        tm.commit()
+        with self.assertLogs('transaction._outbox', 'ERROR'):
+            outbox.start()
+            self.assertTrue(delivered.wait(10))
+        self.assertEqual(failures, [[('q', b'1')]])
+
+
+class FailingDM:
+
+    def sortKey(self):
+        return 'z'
+
+    def abort(self, txn):
+        pass
+
+    def tpc_begin(self, txn):
+        pass
+
+    def commit(self, txn):
+        pass
+
+    def tpc_vote(self, txn):
+        raise ValueError('tpc_vote')
+
+    def tpc_finish(self, txn):
+        pass
+
+    def tpc_abort(self, txn):
+        pass
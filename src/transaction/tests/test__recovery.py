@@ -0,0 +1,369 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE
+#
+##############################################################################
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class CoordinatorLogTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'coordinator.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _getTargetClass(self):
+        from transaction import CoordinatorLog
+        return CoordinatorLog
+
+    def _makeOne(self):
+        log = self._getTargetClass()(self.path)
+        self.addCleanup(log.close)
+        return log
+
+    def _makeManager(self, log):
+        from transaction import TransactionManager
+        tm = TransactionManager()
+        tm.coordinator_log = log
+        return tm
+
+    def test_empty(self):
+        log = self._makeOne()
+        self.assertEqual(log.inDoubt(), {})
+        self.assertEqual(log.recover([]), [])
+
+    def test_commit_logs_decision_and_end(self):
+        log = self._makeOne()
+        tm = self._makeManager(log)
+        dms = [RecoverableDM('b'), RecoverableDM('a')]
+        txn = tm.begin()
+        for dm in dms:
+            txn.join(dm)
+        logged = []
+        orig = log.logCommit
+
+        def _logCommit(transaction, resources):
+            # Nobody was told to finish before the decision was logged.
+            self.assertEqual([dm.finished for dm in dms], [[], []])
+            tid = orig(transaction, resources)
+            logged.append(tid)
+            self.assertEqual(log.inDoubt(), {tid: ['a', 'b']})
+            return tid
+        log.logCommit = _logCommit
+        tm.commit()
+        self.assertEqual(len(logged), 1)
+        self.assertEqual(log.inDoubt(), {})
+
+    def test_commit_wo_log(self):
+        from transaction import TransactionManager
+        tm = TransactionManager()
+        self.assertIsNone(tm.coordinator_log)
+        txn = tm.begin()
+        txn.join(RecoverableDM('a'))
+        tm.commit()
+
+    def test_vote_failure_logs_nothing(self):
+        log = self._makeOne()
+        tm = self._makeManager(log)
+        txn = tm.begin()
+        txn.join(RecoverableDM('a'))
+        txn.join(RecoverableDM('b', fail='tpc_vote'))
+        self.assertRaises(ValueError, tm.commit)
+        tm.abort()
+        self.assertEqual(log.inDoubt(), {})
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), b'')
+
+    def test_finish_failure_leaves_txn_in_doubt_and_recovers(self):
+        log = self._makeOne()
+        tm = self._makeManager(log)
+        a = RecoverableDM('a')
+        b = RecoverableDM('b', fail='tpc_finish')
+        txn = tm.begin()
+        txn.join(a)
+        txn.join(b)
+        self.assertRaises(ValueError, tm.commit)
+        tm.abort()
+        tid = txn.id
+        self.assertEqual(log.inDoubt(), {tid: ['a', 'b']})
+        self.assertEqual(a.finished, [tid])
+        self.assertEqual(b.finished, [])
+
+        # A new process reads the same log.
+        log.close()
+        log = self._makeOne()
+        self.assertEqual(log.inDoubt(), {tid: ['a', 'b']})
+        # Without b, the transaction stays in doubt.
+        self.assertEqual(log.recover([a]), [tid])
+        self.assertEqual(a.recovered, [tid])
+        self.assertEqual(log.recover([a, RecoverableDM('b')]), [])
+        self.assertEqual(log.inDoubt(), {})
+
+    def test_finish_failure_in_the_middle_finishes_the_others(self):
+        from transaction import Outcome
+        log = self._makeOne()
+        tm = self._makeManager(log)
+        a = RecoverableDM('a')
+        b = RecoverableDM('b', fail='tpc_finish')
+        c = RecoverableDM('c')
+        txn = tm.begin()
+        for dm in (c, b, a):
+            txn.join(dm)
+        self.assertRaises(ValueError, tm.commit)
+        tid = txn.id
+        # The decision was logged, so nobody was aborted.
+        self.assertEqual(a.finished, [tid])
+        self.assertEqual(c.finished, [tid])
+        self.assertEqual([dm.tpc_aborted for dm in (a, b, c)],
+                         [False, False, False])
+        self.assertEqual(txn.outcomes,
+                         [(a, Outcome.FINISHED),
+                          (b, Outcome.FAILED),
+                          (c, Outcome.FINISHED)])
+        tm.abort()
+        self.assertEqual(log.inDoubt(), {tid: ['a', 'b', 'c']})
+        b = RecoverableDM('b')
+        self.assertEqual(log.recover([a, b, c]), [])
+        self.assertEqual(b.recovered, [tid])
+        self.assertEqual(log.inDoubt(), {})
+
+    @unittest.skipUnless(os.name == 'posix', 'requires POSIX')
+    def test_finish_failure_in_the_middle_w_journals(self):
+        from transaction import Journal
+        from transaction import JournalDataManager
+        log = self._makeOne()
+        tm = self._makeManager(log)
+        dms = {}
+        for key in 'abc':
+            journal = Journal(os.path.join(self.tmpdir, key + '.journal'))
+            self.addCleanup(journal.close)
+            dms[key] = JournalDataManager(journal, tm, name=key)
+        tm.begin()
+        for key, dm in dms.items():
+            dm[key] = key.encode()
+        orig = dms['b'].tpc_finish
+
+        def tpc_finish(txn):
+            raise ValueError('tpc_finish')
+        dms['b'].tpc_finish = tpc_finish
+        self.assertRaises(ValueError, tm.commit)
+        tm.abort()
+        # c was committed too, not aborted.
+        self.assertEqual(bytes(dms['a']['a']), b'a')
+        self.assertEqual(bytes(dms['c']['c']), b'c')
+        self.assertNotIn('b', dms['b'])
+        dms['b'].tpc_finish = orig
+        self.assertEqual(log.recover(list(dms.values())), [])
+        self.assertEqual(bytes(dms['b']['b']), b'b')
+
+    def test_recover_w_non_recoverable_and_failing_dm(self):
+        log = self._makeOne()
+        txn = Txn()
+        tid = log.logCommit(txn, [RecoverableDM('a'), PlainDM('b')])
+        failing = RecoverableDM('a', fail='recover')
+        self.assertEqual(log.recover([failing, PlainDM('b')]), [tid])
+        self.assertEqual(log.recover([RecoverableDM('a'), PlainDM('b')]),
+                         [tid])
+        self.assertEqual(log.inDoubt(), {tid: ['a', 'b']})
+
+    def test_torn_write_is_dropped(self):
+        log = self._makeOne()
+        tid = log.logCommit(Txn(), [RecoverableDM('a')])
+        log.close()
+        size = os.path.getsize(self.path)
+        with open(self.path, 'ab') as f:
+            f.write(b'\x00\x00\x01\x00garbage')
+        log = self._makeOne()
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(log.inDoubt(), {tid: ['a']})
+        tid2 = log.logCommit(Txn(), [RecoverableDM('b')])
+        self.assertEqual(log.inDoubt(), {tid: ['a'], tid2: ['b']})
+
+    def test_corrupt_record_ends_log(self):
+        log = self._makeOne()
+        tid = log.logCommit(Txn(), [RecoverableDM('a')])
+        log.logCommit(Txn(), [RecoverableDM('b')])
+        log.close()
+        with open(self.path, 'r+b') as f:
+            f.seek(-2, os.SEEK_END)
+            f.write(b'XX')
+        log = self._makeOne()
+        self.assertEqual(log.inDoubt(), {tid: ['a']})
+
+    def test_compact(self):
+        log = self._makeOne()
+        tids = [log.logCommit(Txn(), [RecoverableDM('a')]) for i in range(10)]
+        for tid in tids[1:]:
+            log.logCommitted(tid)
+        size = os.path.getsize(self.path)
+        log.compact()
+        self.assertLess(os.path.getsize(self.path), size)
+        self.assertEqual(log.inDoubt(), {tids[0]: ['a']})
+        log.logCommitted(tids[0])
+        log.sync()
+        self.assertEqual(log.inDoubt(), {})
+        log.compact()
+        self.assertEqual(os.path.getsize(self.path), 0)
+
+    def test_compact_after(self):
+        log = self._makeOne()
+        self.assertEqual(log.compact_after, 1000)
+        log.compact_after = 3
+        tm = self._makeManager(log)
+        sizes = []
+        for i in range(7):
+            txn = tm.begin()
+            txn.join(RecoverableDM('a'))
+            tm.commit()
+            sizes.append(os.path.getsize(self.path))
+        # Compacted after the 3rd and 6th commits.
+        self.assertEqual([size for size in sizes if not size], [0, 0])
+        self.assertEqual(sizes[2], 0)
+        self.assertEqual(sizes[5], 0)
+        # Commits in doubt survive compaction.
+        tid = log.logCommit(Txn(), [RecoverableDM('b')])
+        for i in range(2):
+            txn = tm.begin()
+            txn.join(RecoverableDM('a'))
+            tm.commit()
+        self.assertEqual(log.inDoubt(), {tid: ['b']})
+        log.close()
+        self.assertEqual(self._makeOne().inDoubt(), {tid: ['b']})
+
+    def test_compact_after_none(self):
+        log = self._makeOne()
+        log.compact_after = None
+        log.logCommitted(log.logCommit(Txn(), [RecoverableDM('a')]))
+        self.assertGreater(os.path.getsize(self.path), 0)
+
+    def test_concurrent_commits_share_syncs(self):
+        import threading
+
+        from transaction import _recovery
+        from transaction.tests.common import Monkey
+        log = self._makeOne()
+        syncs = []
+        barrier = threading.Barrier(8)
+
+        def _fsync(fd):
+            syncs.append(fd)
+            os.fsync(fd)
+
+        def _commit():
+            tm = self._makeManager(log)
+            barrier.wait()
+            for i in range(20):
+                txn = tm.begin()
+                txn.join(RecoverableDM('a'))
+                tm.commit()
+        with Monkey(_recovery, _fsync=_fsync):
+            threads = [threading.Thread(target=_commit) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(log.inDoubt(), {})
+        self.assertLessEqual(len(syncs), 8 * 20)
+
+    def test_concurrent_commits_w_compaction(self):
+        import threading
+        log = self._makeOne()
+        log.compact_after = 7
+
+        def _commit():
+            tm = self._makeManager(log)
+            for i in range(20):
+                txn = tm.begin()
+                txn.join(RecoverableDM('a'))
+                tm.commit()
+        threads = [threading.Thread(target=_commit) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(log.inDoubt(), {})
+        log.close()
+        self.assertEqual(self._makeOne().inDoubt(), {})
+
+    def test_sync_failure_propagates_and_is_retried(self):
+        from transaction import _recovery
+        from transaction.tests.common import Monkey
+        log = self._makeOne()
+
+        def _fsync(fd):
+            raise OSError('disk on fire')
+        with Monkey(_recovery, _fsync=_fsync):
+            self.assertRaises(OSError, log.logCommit, Txn(),
+                              [RecoverableDM('a')])
+        self.assertFalse(log._syncing)
+        log.sync()
+        self.assertEqual(log._synced, log._written)
+
+
+class Txn:
+    # Just enough of a transaction for CoordinatorLog.logCommit.
+
+    def __init__(self):
+        from transaction import Transaction
+        self.id = Transaction().id
+
+
+class PlainDM:
+
+    def __init__(self, key, fail=None):
+        self.key = key
+        self.fail = fail
+        self.finished = []
+        self.tpc_aborted = False
+
+    def _maybe_fail(self, method):
+        if self.fail == method:
+            raise ValueError(method)
+
+    def sortKey(self):
+        return self.key
+
+    def abort(self, txn):
+        pass
+
+    def tpc_begin(self, txn):
+        self._maybe_fail('tpc_begin')
+
+    def commit(self, txn):
+        self._maybe_fail('commit')
+
+    def tpc_vote(self, txn):
+        self._maybe_fail('tpc_vote')
+        self.tid = txn.id
+
+    def tpc_finish(self, txn):
+        self._maybe_fail('tpc_finish')
+        self.finished.append(self.tid)
+
+    def tpc_abort(self, txn):
+        self.tpc_aborted = True
+
+
+class RecoverableDM(PlainDM):
+
+    def __init__(self, key, fail=None):
+        super().__init__(key, fail)
+        self.recovered = []
+
+    def recover(self, tid):
+        self._maybe_fail('recover')
+        self.recovered.append(tid)
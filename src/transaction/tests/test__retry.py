@@ -0,0 +1,78 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE
+#
+##############################################################################
+import unittest
+
+
+class RetryRegistryTests(unittest.TestCase):
+
+    def _getTargetClass(self):
+        from transaction import RetryRegistry
+        return RetryRegistry
+
+    def _makeOne(self):
+        return self._getTargetClass()()
+
+    def test_transient_errors_are_retryable(self):
+        from transaction.interfaces import TransientError
+
+        class Conflict(TransientError):
+            pass
+        registry = self._makeOne()
+        self.assertTrue(registry.classify(TransientError))
+        self.assertTrue(registry.classify(Conflict))
+        self.assertIsNone(registry.classify(Exception))
+
+    def test_nearest_declaration_along_mro_wins(self):
+        class A(Exception):
+            pass
+
+        class B(A):
+            pass
+
+        class C(B):
+            pass
+
+        class Mixin:
+            pass
+
+        class D(Mixin, C):
+            pass
+        registry = self._makeOne()
+        registry.declare(A)
+        registry.declare(B, False)
+        self.assertTrue(registry.classify(A))
+        self.assertFalse(registry.classify(B))
+        self.assertFalse(registry.classify(C))
+        registry.declare(Mixin)
+        self.assertTrue(registry.classify(D))
+        self.assertFalse(registry.classify(C))
+
+    def test_classifications_are_cached_until_declarations_change(self):
+        registry = self._makeOne()
+        self.assertIsNone(registry.classify(KeyError))
+        self.assertIn(KeyError, registry._cache)
+        registry.declare(LookupError)
+        self.assertTrue(registry.classify(KeyError))
+        registry.forget(LookupError)
+        self.assertIsNone(registry.classify(KeyError))
+        self.assertRaises(KeyError, registry.forget, LookupError)
+
+    def test_cache_is_bounded(self):
+        from transaction import _retry
+        from transaction.tests.common import Monkey
+        registry = self._makeOne()
+        with Monkey(_retry, _MAX_CACHED=2):
+            for error_type in (KeyError, ValueError, TypeError):
+                registry.classify(error_type)
+        self.assertEqual(list(registry._cache), [TypeError])
@@ -90,6 +90,86 @@ class TransactionTests(unittest.TestCase):
         self.assertEqual(txn._before_commit, [])
         self.assertEqual(txn._after_commit, [])
 
+    def test_untouched_transaction_creates_nothing(self):
+        from transaction import TransactionManager
+        from transaction import _transaction
+        lazy = {'log', 'extension', '_adapters', '_voted'}
+        lazy.update(_transaction._HOOK_NAMES)
+        tm = TransactionManager()
+        txn = tm.begin()
+        self.assertEqual(lazy & set(vars(txn)), set())
+        tm.commit()
+        # Freeing only resets the dictionaries.
+        lazy -= {'extension', '_adapters', '_voted'}
+        self.assertEqual(lazy & set(vars(txn)), set())
+        txn = tm.begin()
+        tm.abort()
+        self.assertEqual(lazy & set(vars(txn)), set())
+
+    def test_lazy_attributes_are_created_when_used(self):
+        from transaction._transaction import _Hooks
+        txn = self._makeOne()
+        self.assertNotIn('_before_commit', vars(txn))
+        txn.addBeforeCommitHook(id)
+        self.assertIsInstance(vars(txn)['_before_commit'], _Hooks)
+        self.assertIs(txn._before_commit, txn._before_commit)
+        txn.extension['a'] = 1
+        self.assertEqual(txn.extension, {'a': 1})
+        txn.extension = {'b': 2}
+        self.assertEqual(txn._extension, {'b': 2})
+
+    def test_debug_log_when_enabled(self):
+        with self.assertLogs('txn', 'DEBUG') as logs:
+            txn = self._makeOne()
+            txn.commit()
+        self.assertEqual([record.getMessage() for record in logs.records],
+                         ['new transaction', 'commit'])
+
+    def test_id(self):
+        import os
+        txn = self._makeOne()
+        self.assertIsInstance(txn.id, str)
+        self.assertEqual(len(txn.id), 24)
+        self.assertIs(txn.id, txn.id)
+        self.assertEqual(int(txn.id[16:], 16), os.getpid())
+
+    def test_id_unique_and_sorted(self):
+        txns = [self._makeOne() for _ in range(1000)]
+        ids = [txn.id for txn in txns]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(sorted(ids), ids)
+
+    def test_id_w_clock_going_backwards(self):
+        from transaction import _transaction
+        from transaction.tests.common import Monkey
+
+        class _Time:
+            @staticmethod
+            def time_ns():
+                return 1
+        first = self._makeOne()
+        with Monkey(_transaction, time=_Time):
+            second = self._makeOne()
+            third = self._makeOne()
+        self.assertLess(first.id, second.id)
+        self.assertLess(second.id, third.id)
+
+    def test_id_pid_reset_after_fork(self):
+        from transaction import _transaction
+        from transaction.tests.common import Monkey
+
+        class _OS:
+            @staticmethod
+            def getpid():
+                return 0xabc
+        try:
+            with Monkey(_transaction, os=_OS):
+                _transaction._reset_id_pid()
+            self.assertTrue(self._makeOne().id.endswith('00000abc'))
+        finally:
+            _transaction._reset_id_pid()
+        self.assertFalse(self._makeOne().id.endswith('00000abc'))
+
     def test_ctor_w_syncs(self):
         from transaction.weakset import WeakSet
         synchs = WeakSet()
@@ -570,6 +650,150 @@ class TransactionTests(unittest.TestCase):
         self.assertEqual(list(txn.getBeforeCommitHooks()),
                          [(_hook, ('one',), {})])
 
+    def test_addBeforeCommitHook_w_order(self):
+        def _hook(*args, **kw):
+            raise AssertionError("Not called")
+        txn = self._makeOne()
+        txn.addBeforeCommitHook(_hook, ('expensive',), order=10)
+        txn.addBeforeCommitHook(_hook, ('default',))
+        txn.addBeforeCommitHook(_hook, ('validate',), order=-10)
+        txn.addBeforeCommitHook(_hook, ('default2',))
+        txn.addBeforeCommitHook(_hook, ('expensive2',), order=10)
+        self.assertEqual([args for _, args, _ in txn.getBeforeCommitHooks()],
+                         [('validate',), ('default',), ('default2',),
+                          ('expensive',), ('expensive2',)])
+
+    def test_callBeforeCommitHooks_w_order_fails_fast(self):
+        _calls = []
+
+        def _expensive():
+            _calls.append('expensive')
+
+        def _validate():
+            _calls.append('validate')
+            raise ValueError()
+        txn = self._makeOne()
+        txn.addBeforeCommitHook(_expensive)
+        txn.addBeforeCommitHook(_validate, order=-1)
+        self.assertRaises(ValueError, txn._callBeforeCommitHooks)
+        self.assertEqual(_calls, ['validate'])
+
+    def test_callBeforeCommitHooks_w_order_registering_during_dispatch(self):
+        _calls = []
+        txn = self._makeOne()
+
+        def _hook(name):
+            _calls.append(name)
+
+        def _registering():
+            _calls.append('registering')
+            # Lower order than anything registered, yet it must still
+            # run: after the running hook, before the pending ones.
+            txn.addBeforeCommitHook(_hook, ('early',), order=-100)
+            txn.addBeforeCommitHook(_hook, ('late',), order=100)
+        txn.addBeforeCommitHook(_hook, ('first',), order=-1)
+        txn.addBeforeCommitHook(_registering)
+        txn.addBeforeCommitHook(_hook, ('last',), order=1)
+        txn._callBeforeCommitHooks()
+        self.assertEqual(_calls,
+                         ['first', 'registering', 'early', 'last', 'late'])
+        self.assertEqual(list(txn.getBeforeCommitHooks()), [])
+
+    def test_addBeforeCommitHook_w_key(self):
+        def _hook(*args, **kw):
+            raise AssertionError("Not called")
+
+        def _other(*args, **kw):
+            raise AssertionError("Not called")
+        txn = self._makeOne()
+        txn.addBeforeCommitHook(_hook, ('one',), key='flush')
+        txn.addBeforeCommitHook(_other, ('two',))
+        txn.addBeforeCommitHook(_hook, ('three',), dict(tres=3), key='flush')
+        txn.addBeforeCommitHook(_other, ('four',), key='other')
+        self.assertEqual(list(txn.getBeforeCommitHooks()),
+                         [(_hook, ('three',), {'tres': 3}),
+                          (_other, ('two',), {}),
+                          (_other, ('four',), {})])
+
+    def test_addBeforeCommitHook_w_key_and_order(self):
+        def _hook(*args, **kw):
+            raise AssertionError("Not called")
+        txn = self._makeOne()
+        txn.addBeforeCommitHook(_hook, ('flush',), key='flush')
+        txn.addBeforeCommitHook(_hook, ('validate',), order=-1)
+        # The keyed hook moved when 'validate' was inserted before it.
+        txn.addBeforeCommitHook(_hook, ('flush2',), key='flush')
+        self.assertEqual([args for _, args, _ in txn.getBeforeCommitHooks()],
+                         [('validate',), ('flush2',)])
+
+    def test_callBeforeCommitHooks_w_key_reregistered_during_dispatch(self):
+        _calls = []
+        txn = self._makeOne()
+
+        def _flush(n):
+            _calls.append(n)
+            if n < 2:
+                # Already called, so this is a new registration.
+                txn.addBeforeCommitHook(_flush, (n + 1,), key='flush')
+        txn.addBeforeCommitHook(_flush, (0,), key='flush')
+        txn._callBeforeCommitHooks()
+        self.assertEqual(_calls, [0, 1, 2])
+        txn.addBeforeCommitHook(_flush, (5,), key='flush')
+        self.assertEqual(list(txn.getBeforeCommitHooks()),
+                         [(_flush, (5,), {})])
+
+    def test_getBeforeCommitBatch(self):
+        _calls = []
+
+        def _hook(batch):
+            _calls.append(list(batch))
+        txn = self._makeOne()
+        batch = txn.getBeforeCommitBatch(_hook)
+        self.assertEqual(batch, [])
+        batch.append(1)
+        txn.getBeforeCommitBatch(_hook).append(2)
+        other = txn.getBeforeCommitBatch(_hook, key='other')
+        self.assertIsNot(other, batch)
+        other.append(3)
+        self.assertEqual(list(txn.getBeforeCommitHooks()),
+                         [(_hook, ([1, 2],), {}), (_hook, ([3],), {})])
+        txn._callBeforeCommitHooks()
+        self.assertEqual(_calls, [[1, 2], [3]])
+
+    def test_getBeforeCommitBatch_w_order(self):
+        _calls = []
+
+        def _hook(*args):
+            _calls.append(args)
+        txn = self._makeOne()
+        txn.getBeforeCommitBatch(_hook).append('batched')
+        txn.addBeforeCommitHook(_hook, ('validate',), order=-1)
+        txn._callBeforeCommitHooks()
+        self.assertEqual(_calls, [('validate',), (['batched'],)])
+
+    def test_getBeforeCommitBatch_appended_after_call(self):
+        _calls = []
+        txn = self._makeOne()
+
+        def _hook(batch):
+            _calls.append(list(batch))
+
+        def _late():
+            txn.getBeforeCommitBatch(_hook).append('late')
+        txn.getBeforeCommitBatch(_hook).append('early')
+        txn.addBeforeCommitHook(_late)
+        txn._callBeforeCommitHooks()
+        self.assertEqual(_calls, [['early'], ['late']])
+
+    def test_getBeforeCommitBatch_dropped_on_abort(self):
+        def _hook(batch):
+            raise AssertionError("Not called")
+        txn = self._makeOne()
+        txn.getBeforeCommitBatch(_hook).append(1)
+        txn.abort()
+        self.assertEqual(list(txn.getBeforeCommitHooks()), [])
+        self.assertEqual(txn.getBeforeCommitBatch(_hook), [])
+
     def test_getAfterCommitHooks_empty(self):
         txn = self._makeOne()
         self.assertEqual(list(txn.getAfterCommitHooks()), [])
@@ -791,6 +1015,70 @@ class TransactionTests(unittest.TestCase):
         self.assertTrue(logger._log[2][1].startswith(
                         'A storage error occurred'))
 
+    def test__commitResources_outcomes_on_success(self):
+        from transaction import Outcome
+        resources = [Resource('bbb'), Resource('aaa')]
+        txn = self._makeOne()
+        self.assertEqual(txn.outcomes, ())
+        txn._resources.extend(resources)
+        txn._commitResources()
+        self.assertEqual(txn.outcomes, [(resources[1], Outcome.FINISHED),
+                                        (resources[0], Outcome.FINISHED)])
+
+    def test__commitResources_outcomes_on_error_in_tpc_finish(self):
+        from transaction import Outcome
+        aaa, bbb, ccc = (Resource('aaa'), Resource('bbb', 'tpc_finish'),
+                         Resource('ccc'))
+        txn = self._makeOne()
+        txn._resources.extend([ccc, bbb, aaa])
+        self.assertRaises(ValueError, txn._commitResources)
+        self.assertEqual(txn.outcomes, [(aaa, Outcome.FINISHED),
+                                        (bbb, Outcome.FAILED),
+                                        (ccc, Outcome.ABORTED)])
+        # Finished resources aren't aborted, the others are.
+        self.assertTrue(aaa._f)
+        self.assertFalse(aaa._x)
+        self.assertTrue(bbb._x)
+        self.assertFalse(ccc._f)
+        self.assertTrue(ccc._x)
+
+    def test__commitResources_outcomes_on_error_in_tpc_vote(self):
+        from transaction import Outcome
+        aaa, bbb = Resource('aaa'), Resource('bbb', 'tpc_vote')
+        txn = self._makeOne()
+        txn._resources.extend([aaa, bbb])
+        self.assertRaises(ValueError, txn._commitResources)
+        self.assertEqual(txn.outcomes, [(aaa, Outcome.ABORTED),
+                                        (bbb, Outcome.ABORTED)])
+
+    def test_commit_outcomes_visible_to_synchronizers_and_hooks(self):
+        from transaction import Outcome
+        from transaction.weakset import WeakSet
+        seen = []
+
+        class _Synch:
+            def beforeCompletion(self, txn):
+                pass
+
+            def afterCompletion(self, txn):
+                seen.append(('synch', list(txn.outcomes)))
+        synch = _Synch()
+        ws = WeakSet()
+        ws.add(synch)
+        aaa, bbb = Resource('aaa'), Resource('bbb', 'tpc_finish')
+        txn = self._makeOne(synchronizers=ws)
+        txn.join(aaa)
+        txn.join(bbb)
+
+        def _hook(status):
+            seen.append((status, list(txn.outcomes)))
+        txn.addAfterCommitHook(_hook)
+        self.assertRaises(ValueError, txn.commit)
+        expected = [(aaa, Outcome.FINISHED), (bbb, Outcome.FAILED)]
+        self.assertEqual(seen, [('synch', expected), (False, expected)])
+        txn.abort()
+        self.assertEqual(txn.outcomes, ())
+
     def test_abort_wo_savepoints_wo_hooks_wo_synchronizers(self):
         from transaction import _transaction
         from transaction._transaction import Status
@@ -1073,6 +1361,56 @@ class TransactionTests(unittest.TestCase):
         self.assertIsNot(t._synchronizers, synchs)
         self.assertTrue(resource._a)
 
+    def test_abort_untouched_skips_resources_and_hooks(self):
+        from unittest import mock
+
+        from transaction import TransactionManager
+        sync = mock.MagicMock()
+        tm = TransactionManager()
+        tm.registerSynch(sync)
+        txn = tm.begin()
+        txn.set_data(self, 42)
+        with mock.patch.object(txn, '_callAfterAbortHooks') as hooks:
+            tm.abort()
+        hooks.assert_not_called()
+        sync.beforeCompletion.assert_called_once_with(txn)
+        sync.afterCompletion.assert_called_once_with(txn)
+        self.assertIsNone(tm._txn)
+        self.assertIsNone(txn._manager)
+        self.assertRaises(KeyError, txn.data, self)
+        self.assertNotIn('_after_abort', vars(txn))
+
+    def test_abort_untouched_synchronizer_error(self):
+        from transaction import _transaction
+        from transaction.tests.common import DummyLogger
+        from transaction.tests.common import Monkey
+
+        class _Synch:
+            _after = None
+
+            def beforeCompletion(self, txn):
+                raise ValueError('test')
+
+            def afterCompletion(self, txn):
+                self._after = txn
+
+        class Synchs:
+            synchs = [_Synch()]
+
+            def map(self, func):
+                for s in self.synchs:
+                    func(s)
+        logger = DummyLogger()
+        synchs = Synchs()
+        with Monkey(_transaction, _LOGGER=logger):
+            txn = self._makeOne(synchronizers=synchs)
+            logger._clear()
+            self.assertRaises(ValueError, txn.abort)
+        self.assertEqual(logger._log[0][0], 'error')
+        self.assertEqual(logger._log[0][1], 'Failed to call synchronizers')
+        self.assertIs(synchs.synchs[0]._after, txn)
+        self.assertIsNot(txn._synchronizers, synchs)
+
     def test_abort_clears_resources(self):
         class DM:
             def abort(self, txn):
@@ -1278,6 +1616,34 @@ class TransactionTests(unittest.TestCase):
         finally:
             txn.abort()
 
+    def test_note_same_as_extending_description(self):
+        def note(description, text):
+            text = text.strip()
+            return description + "\n" + text if description else text
+        steps = ['', ' a ', '', 'b', ('set', ''), '', 'c', ('set', 'd'),
+                 ('read',), '', ('read',), 'e', '']
+        txn = self._makeOne()
+        expected = ''
+        for step in steps:
+            if isinstance(step, str):
+                txn.note(step)
+                expected = note(expected, step)
+            elif step[0] == 'set':
+                txn.description = expected = step[1]
+            else:
+                self.assertEqual(txn.description, expected)
+        self.assertEqual(txn.description, expected)
+        self.assertEqual(expected, 'd\n\ne\n')
+
+    def test_note_many(self):
+        txn = self._makeOne()
+        for i in range(10000):
+            txn.note(str(i))
+        self.assertEqual(txn.description,
+                         "\n".join(str(i) for i in range(10000)))
+        txn.note('last')
+        self.assertTrue(txn.description.endswith('9999\nlast'))
+
     def test_note_bytes(self):
         txn = self._makeOne()
         with warnings.catch_warnings(record=True) as w:
@@ -1481,6 +1847,86 @@ class TransactionTests(unittest.TestCase):
         txn._resources.append(res2)
         self.assertTrue(txn.isRetryableError(Exception()))
 
+    def _makeRetryBlockTxn(self):
+        from transaction import MemoryDataManager
+        from transaction import TransactionManager
+        tm = TransactionManager()
+        dm = MemoryDataManager({}, tm)
+        return tm, dm
+
+    def test_retryBlock_retries_only_the_block(self):
+        from transaction.interfaces import TransientError
+        tm, dm = self._makeRetryBlockTxn()
+        txn = tm.get()
+        dm['before'] = 1
+        runs = []
+        for attempt in txn.retryBlock(3):
+            with attempt as t:
+                self.assertIs(t, txn)
+                runs.append(len(runs))
+                dm['block'] = len(runs)
+                if len(runs) < 3:
+                    dm['failed'] = True
+                    raise TransientError()
+        self.assertEqual(runs, [0, 1, 2])
+        self.assertEqual(dict(dm), {'before': 1, 'block': 3})
+        self.assertIs(tm.get(), txn)
+        tm.commit()
+        self.assertEqual(dm.committed, {'before': 1, 'block': 3})
+
+    def test_retryBlock_stops_after_success(self):
+        tm, dm = self._makeRetryBlockTxn()
+        runs = []
+        for attempt in tm.get().retryBlock():
+            with attempt:
+                runs.append(1)
+        self.assertEqual(runs, [1])
+
+    def test_retryBlock_gives_up_after_tries(self):
+        from transaction.interfaces import TransientError
+        tm, dm = self._makeRetryBlockTxn()
+        runs = []
+        with self.assertRaises(TransientError):
+            for attempt in tm.get().retryBlock(2):
+                with attempt:
+                    runs.append(1)
+                    dm['a'] = 1
+                    raise TransientError()
+        self.assertEqual(runs, [1, 1])
+        # The last attempt isn't rolled back.
+        self.assertEqual(dict(dm), {'a': 1})
+
+    def test_retryBlock_doesnt_retry_other_errors(self):
+        tm, dm = self._makeRetryBlockTxn()
+        runs = []
+        with self.assertRaises(ValueError):
+            for attempt in tm.get().retryBlock():
+                with attempt:
+                    runs.append(1)
+                    raise ValueError()
+        self.assertEqual(runs, [1])
+        with self.assertRaises(KeyboardInterrupt):
+            for attempt in tm.get().retryBlock():
+                with attempt:
+                    raise KeyboardInterrupt()
+
+    def test_retryBlock_w_should_retry(self):
+        tm, dm = self._makeRetryBlockTxn()
+        dm.should_retry = lambda error: isinstance(error, KeyError)
+        dm['a'] = 1
+        runs = []
+        for attempt in tm.get().retryBlock():
+            with attempt:
+                runs.append(1)
+                if len(runs) == 1:
+                    raise KeyError()
+        self.assertEqual(runs, [1, 1])
+
+    def test_retryBlock_invalid_tries(self):
+        txn = self._makeOne()
+        with self.assertRaises(ValueError):
+            next(txn.retryBlock(0))
+
 
 class Test_rm_key(unittest.TestCase):
 
@@ -1582,6 +2028,136 @@ class SavepointTests(unittest.TestCase):
         self.assertTrue(txn._sarce)
 
 
+class ForkContextTests(unittest.TestCase):
+
+    def setUp(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        import transaction
+        self.executor = ThreadPoolExecutor(4)
+        self.addCleanup(self.executor.shutdown)
+        self.txn = transaction.begin()
+        self.addCleanup(transaction.abort)
+
+    def test_workers_join_and_register_hooks(self):
+        import transaction
+        from transaction import MemoryDataManager
+        dms = [MemoryDataManager() for i in range(8)]
+        hooked = []
+        context = self.txn.forkContext()
+        self.assertIsNot(self.txn._lock, transaction._transaction._noLock)
+
+        def work(dm, i):
+            txn = transaction.get()
+            dm['i'] = i
+            txn.addBeforeCommitHook(hooked.append, (i,))
+            txn.getBeforeCommitBatch(hooked.append, key='batch').append(i)
+            return txn
+
+        futures = [context.submit(self.executor, work, dm, i)
+                   for i, dm in enumerate(dms)]
+        transaction.commit()
+        self.assertEqual([future.result() for future in futures],
+                         [self.txn] * 8)
+        self.assertEqual([dm.committed for dm in dms],
+                         [{'i': i} for i in range(8)])
+        batch = [h for h in hooked if isinstance(h, list)]
+        self.assertEqual(len(batch), 1)
+        self.assertEqual(sorted(batch[0]), list(range(8)))
+        self.assertEqual(sorted(h for h in hooked if isinstance(h, int)),
+                         list(range(8)))
+        # The workers' own transactions are back.
+        self.assertIsNot(self.executor.submit(transaction.get).result(),
+                         self.txn)
+
+    def test_commit_waits_for_workers(self):
+        import threading
+
+        import transaction
+        from transaction import MemoryDataManager
+        dm = MemoryDataManager()
+        release = threading.Event()
+        context = self.txn.forkContext()
+
+        def work():
+            release.wait()
+            dm['a'] = 1
+        context.submit(self.executor, work)
+        self.assertFalse(context.wait(0.01))
+        threading.Timer(0.05, release.set).start()
+        transaction.commit()
+        self.assertEqual(dm.committed, {'a': 1})
+        self.assertTrue(context.wait(0))
+
+    def test_failed_worker_dooms(self):
+        import transaction
+        from transaction.interfaces import DoomedTransaction
+
+        def work():
+            raise ValueError('failed')
+        future = self.txn.forkContext().submit(self.executor, work)
+        self.assertRaises(DoomedTransaction, transaction.commit)
+        self.assertRaises(ValueError, future.result)
+
+    def test_worker_cant_complete_the_transaction(self):
+        import transaction
+        future = self.txn.forkContext().submit(self.executor,
+                                               transaction.commit)
+        self.assertRaises(ValueError, future.result)
+
+    def test_context_manager_in_thread(self):
+        import threading
+
+        import transaction
+        context = self.txn.forkContext()
+        seen = []
+
+        def work():
+            before = transaction.get()
+            with context as txn:
+                seen.append(txn is transaction.get() is self.txn)
+                with context:
+                    pass
+                seen.append(transaction.get() is self.txn)
+            seen.append(transaction.get() is before)
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        self.assertEqual(seen, [True, True, True])
+        self.assertEqual(context._workers, {})
+
+    def test_cancelled_submission_isnt_waited_for(self):
+        from unittest import mock
+        future = mock.Mock()
+        executor = mock.Mock()
+        executor.submit.return_value = future
+        context = self.txn.forkContext()
+        self.assertIs(context.submit(executor, id, 1), future)
+        self.assertFalse(context.wait(0))
+        [(callback,), _] = future.add_done_callback.call_args
+        future.cancelled.return_value = True
+        callback(future)
+        self.assertTrue(context.wait(0))
+
+    def test_failed_submission_isnt_waited_for(self):
+        from unittest import mock
+        executor = mock.Mock()
+        executor.submit.side_effect = RuntimeError('shut down')
+        context = self.txn.forkContext()
+        self.assertRaises(RuntimeError, context.submit, executor, id)
+        self.assertTrue(context.wait(0))
+
+    def test_closed_after_completion(self):
+        import transaction
+        context = self.txn.forkContext()
+        transaction.abort()
+        self.assertEqual(self.txn._forks, ())
+        self.assertRaises(ValueError, context.submit, self.executor, id)
+        with self.assertRaises(ValueError):
+            with context:
+                pass
+
+
 class AbortSavepointTests(unittest.TestCase):
 
     def _getTargetClass(self):
@@ -0,0 +1,198 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE
+#
+##############################################################################
+import os
+import unittest
+from unittest import mock
+
+
+class WatchdogTests(unittest.TestCase):
+
+    def _getTargetClass(self):
+        from transaction import Watchdog
+        return Watchdog
+
+    def _makeOne(self, threshold=0, interval=3600, **kw):
+        watchdog = self._getTargetClass()(threshold, interval, **kw)
+        watchdog.start()
+        self.addCleanup(watchdog.stop)
+        return watchdog
+
+    def test_not_running(self):
+        from transaction import TransactionManager
+        from transaction import _transaction
+        self.assertIsNone(_transaction._WATCHDOG)
+        txn = TransactionManager().begin()
+        self.assertIsNone(txn._watchdog)
+
+    def test_check_reports_open_transactions(self):
+        from transaction import TransactionManager
+        watchdog = self._makeOne()
+        tm = TransactionManager()
+        txn = tm.begin()
+        with self.assertLogs('transaction._watchdog', 'WARNING') as logs:
+            old = watchdog.check()
+        self.assertEqual(len(old), 1)
+        found, age, stack = old[0]
+        self.assertIs(found, txn)
+        self.assertGreaterEqual(age, 0)
+        # The stack ends where the transaction was begun.
+        self.assertEqual([frame.name for frame in stack[-2:]],
+                         ['test_check_reports_open_transactions', 'begin'])
+        self.assertIn(txn.id, logs.output[0])
+        self.assertIn('test_check_reports_open_transactions',
+                      logs.output[0])
+        # Source lines are looked up when reporting.
+        self.assertEqual(stack[-2].line, 'txn = tm.begin()')
+        self.assertIn('txn = tm.begin()', logs.output[0])
+        self.assertFalse(txn.isDoomed())
+
+    def test_check_ignores_young_and_finished_transactions(self):
+        from transaction import TransactionManager
+        watchdog = self._makeOne(threshold=3600)
+        tm = TransactionManager()
+        tm.begin()
+        self.assertEqual(watchdog.check(), [])
+        watchdog.threshold = 0
+        tm.commit()
+        tm.begin()
+        tm.abort()
+        self.assertEqual(watchdog.check(), [])
+        self.assertEqual(watchdog._active, {})
+
+    def test_check_forgets_dropped_transactions(self):
+        import gc
+
+        from transaction import Transaction
+        watchdog = self._makeOne(threshold=3600)
+        Transaction()
+        gc.collect()
+        self.assertEqual(len(watchdog._active), 1)
+        self.assertEqual(watchdog.check(), [])
+        self.assertEqual(watchdog._active, {})
+
+    def test_check_wo_stacks(self):
+        from transaction import TransactionManager
+        watchdog = self._makeOne(stacks=False)
+        txn = TransactionManager().get()
+        with self.assertLogs('transaction._watchdog', 'WARNING'):
+            self.assertEqual(watchdog.check(), [(txn, mock.ANY,
+                                                 None)])
+
+    def test_check_w_doom(self):
+        from transaction import TransactionManager
+        from transaction._transaction import Status
+        from transaction.interfaces import DoomedTransaction
+        watchdog = self._makeOne(doom=True)
+        tm = TransactionManager()
+        txn = tm.begin()
+        committing = TransactionManager().begin()
+        committing.status = Status.COMMITTING
+        with self.assertLogs('transaction._watchdog', 'WARNING'):
+            watchdog.check()
+        self.assertTrue(txn.isDoomed())
+        self.assertIs(committing.status, Status.COMMITTING)
+        self.assertRaises(DoomedTransaction, tm.commit)
+
+    def test_check_w_doom_while_committing(self):
+        from transaction import TransactionManager
+        watchdog = self._makeOne(doom=True)
+        tm = TransactionManager()
+        txn = tm.begin()
+        checked = []
+
+        def _check():
+            # The watchdog runs after the transaction checked that it
+            # wasn't doomed, but before its status changes.
+            with self.assertLogs('transaction._watchdog', 'WARNING'):
+                checked.extend(watchdog.check())
+        txn.addBeforeCommitHook(_check)
+        tm.commit()
+        self.assertEqual([found for found, _, _ in checked], [txn])
+        self.assertFalse(txn.isDoomed())
+        self.assertEqual(watchdog._committing, set())
+
+    def test_check_w_doom_race(self):
+        from transaction import TransactionManager
+        watchdog = self._makeOne(doom=True)
+        txn = TransactionManager().begin()
+
+        def _doom():
+            raise ValueError('non-doomable')
+        txn.doom = _doom
+        with self.assertLogs('transaction._watchdog', 'WARNING'):
+            self.assertEqual(len(watchdog.check()), 1)
+
+    def test_periodic_checks(self):
+        import threading
+
+        from transaction import TransactionManager
+        watchdog = self._makeOne(interval=0.01)
+        checked = threading.Event()
+        orig = watchdog.check
+
+        def _check():
+            result = orig()
+            checked.set()
+            return result
+        watchdog.check = _check
+        TransactionManager().begin()
+        with self.assertLogs('transaction._watchdog', 'WARNING'):
+            self.assertTrue(checked.wait(10))
+
+    def test_stop(self):
+        from transaction import TransactionManager
+        from transaction import _transaction
+        watchdog = self._makeOne()
+        TransactionManager().begin()
+        watchdog.stop()
+        self.assertIsNone(_transaction._WATCHDOG)
+        self.assertIsNone(watchdog._thread)
+        self.assertEqual(watchdog.check(), [])
+        # Stopping a replaced watchdog leaves the new one alone.
+        other = self._makeOne()
+        watchdog.stop()
+        self.assertIs(_transaction._WATCHDOG, other)
+
+    def test_forgetWatchdog(self):
+        from transaction import TransactionManager
+        from transaction import _transaction
+        from transaction._watchdog import _forgetWatchdog
+        watchdog = self._makeOne()
+        TransactionManager().begin()
+        # The watchdog thread was checking when the process forked.
+        watchdog._lock.acquire()
+        _forgetWatchdog()
+        self.assertIsNone(_transaction._WATCHDOG)
+        self.assertIsNone(TransactionManager().begin()._watchdog)
+        self.assertEqual(watchdog.check(), [])
+        _forgetWatchdog()
+        self.assertIsNone(_transaction._WATCHDOG)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_fork(self):
+        from transaction import TransactionManager
+        from transaction import _transaction
+        self._makeOne()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            code = 1
+            try:
+                if (_transaction._WATCHDOG is None
+                        and TransactionManager().begin()._watchdog is None):
+                    code = 0
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertIsNotNone(_transaction._WATCHDOG)
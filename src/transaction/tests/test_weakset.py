@@ -101,6 +101,15 @@ class WeakSetTests(unittest.TestCase):
         for thing in dummy, dummy2, dummy3:
             self.assertEqual(thing.poked, 1)
 
+    def test_map_empty_takes_no_snapshot(self):
+        from transaction.weakset import WeakSet
+        w = WeakSet()
+
+        def _fail():
+            self.fail("snapshot taken")
+        w.as_weakref_list = _fail
+        w.map(self.fail)
+
     def test_map_w_gced_element(self):
         import gc
 
@@ -130,6 +139,34 @@ class WeakSetTests(unittest.TestCase):
         for thing in dummy, dummy2:
             self.assertEqual(thing.poked, 1)
 
+    def test_concurrent_add_remove(self):
+        import threading
+
+        from transaction.weakset import WeakSet
+        w = WeakSet()
+        keep = [Dummy() for _ in range(50)]
+
+        def churn():
+            for _ in range(200):
+                for thing in keep:
+                    w.add(thing)
+                w.map(lambda x: None)
+                for thing in keep:
+                    if thing in w:
+                        try:
+                            w.remove(thing)
+                        except KeyError:
+                            # Removed by another thread in the meantime.
+                            pass
+        threads = [threading.Thread(target=churn) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for thing in keep:
+            w.add(thing)
+        self.assertEqual(len(w), len(keep))
+
 
 class Dummy:
     pass
@@ -12,6 +12,7 @@
 #
 ############################################################################
 
+import threading
 import weakref
 
 
@@ -29,12 +30,21 @@ class WeakSet:
     When the only references to an object are weak references (including
     those from WeakSets), the object can be garbage-collected, and
     will vanish from any WeakSets it may be a member of at that time.
+
+    WeakSets may be shared between threads: mutation and snapshotting
+    are serialized by an internal lock, so this is safe even on
+    free-threaded (no-GIL) builds of CPython.  Iteration happens over a
+    snapshot (see `as_weakref_list`), so it never holds the lock while
+    calling out to foreign code.
     """
 
     def __init__(self):
         # Map id(obj) to obj.  By using ids as keys, we avoid requiring
         # that the elements be hashable or comparable.
         self.data = weakref.WeakValueDictionary()
+        # Uncontended acquisition is cheap, so we always take the lock
+        # rather than having a separate thread-safe variant.
+        self._lock = threading.Lock()
 
     def __len__(self):
         return len(self.data)
@@ -44,19 +54,25 @@ class WeakSet:
 
     # Same as a Set, add obj to the collection.
     def add(self, obj):
-        self.data[id(obj)] = obj
+        with self._lock:
+            self.data[id(obj)] = obj
 
     # Same as a Set, remove obj from the collection, and raise
     # KeyError if obj not in the collection.
     def remove(self, obj):
-        del self.data[id(obj)]
+        with self._lock:
+            del self.data[id(obj)]
 
     def clear(self):
-        self.data.clear()
+        with self._lock:
+            self.data.clear()
 
     # f is a one-argument function.  Execute f(elt) for each elt in the
     # set.  f's return value is ignored.
     def map(self, f):
+        if not self.data:
+            # The common case of no synchronizers: skip the snapshot.
+            return
         for wr in self.as_weakref_list():
             elt = wr()
             if elt is not None:
@@ -83,5 +99,7 @@ class WeakSet:
     def as_weakref_list(self):
         # The docstring of WeakValueDictionary.valuerefs()
         # guarantees to return an actual list on all supported versions
-        # of Python.
-        return self.data.valuerefs()
+        # of Python.  Taking the lock keeps concurrent mutation from
+        # invalidating the copy while it is being made.
+        with self._lock:
+            return self.data.valuerefs()